@@ -1,17 +1,59 @@
 import streamlit as st
-import tempfile
-from io import BytesIO
+import os
+import uuid
+import numpy as np
 import pandas as pd
 import support
+import exportacao
 import nomes_colaboradores
+import fila
+from tarefas import TarefaFila
 
-# Cache converter to Excel bytes
-@st.cache_data
-def df_to_excel(df: pd.DataFrame) -> bytes:
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False)
-    return output.getvalue()
+# Centros de distribuição atendidos
+CDS = [31, 59, 67]
+
+# Linhas por página na tabela de dados brutos
+TAMANHOS_PAGINA = [100, 500, 1000, 5000]
+COLUNAS_DADOS_BRUTOS = ['Dia', 'Data', 'COLABORADOR', 'ENTRADA', 'SAIDA INTERVALO', 'VOLTA INTERVALO', 'SAIDA', 'AUSENCIA', 'ALERTA']
+
+
+@st.cache_resource(max_entries=32)
+def indice_filtros(id_resultado: str, _df: pd.DataFrame) -> dict:
+    """
+    Índice dos filtros da aba Dados Brutos, montado uma vez por resultado:
+    posições das linhas de cada colaborador e CD e das linhas com alerta
+    ou ausência. Filtrar passa a ser interseção de posições, sem percorrer
+    nem copiar o resultado.
+    """
+    def preenchidas(coluna: str) -> np.ndarray:
+        valores = _df[coluna]
+        return np.flatnonzero((valores.notna() & (valores != '')).to_numpy())
+
+    indice = {
+        'colaboradores': _df['COLABORADOR'].dropna().unique().tolist(),
+        'posicoes_colaborador': _df.groupby('COLABORADOR', sort=False, observed=True).indices,
+        'posicoes_alerta': preenchidas('ALERTA'),
+        'posicoes_ausencia': preenchidas('AUSENCIA'),
+        'cds': [],
+        'posicoes_cd': {},
+    }
+    if 'CD' in _df.columns:
+        indice['cds'] = sorted(_df['CD'].dropna().unique().tolist())
+        indice['posicoes_cd'] = _df.groupby('CD', sort=False, observed=True).indices
+    return indice
+
+
+def intersecao(posicoes, outras: np.ndarray) -> np.ndarray:
+    """
+    Interseção de posições ordenadas; None representa todas as linhas.
+    """
+    if posicoes is None:
+        return outras
+    return np.intersect1d(posicoes, outras, assume_unique=True)
+
+
+def posicoes_dos_valores(posicoes_por_valor: dict, valores: list) -> np.ndarray:
+    return np.sort(np.concatenate([posicoes_por_valor[valor] for valor in valores]))
 
 st.set_page_config(
     page_title="Análise de Ponto - PDF para Excel",
@@ -22,40 +64,127 @@ st.set_page_config(
 
 st.title("🕐 Sistema de Análise de Ponto")
 
+
+# Serviço da fila de PDFs, compartilhado por todas as sessões; é iniciado
+# (ou reiniciado) aqui se não estiver rodando. Com FILA_EXTERNA definida, o
+# serviço é gerenciado à parte (python fila.py).
+if not os.environ.get('FILA_EXTERNA'):
+    fila.garantir_servico(num_workers=int(os.environ.get('FILA_WORKERS', os.cpu_count() or 1)))
+
 # Sidebar para configurações
 with st.sidebar:
     st.header("⚙️ Configurações")
     cd_selecionado = st.selectbox(
         "Centro de Distribuição:",
-        options=[31, 59, 67],
-        help="Selecione o CD para análise"
+        options=CDS,
+        help="CD usado por padrão para os PDFs enviados"
+    )
+
+    motor_extracao = st.selectbox(
+        "Motor de extração:",
+        options=list(support.MOTORES_EXTRACAO),
+        help="'coordenadas' usa o layout fixo do espelho e é mais rápido; 'tabelas' é o leitor genérico"
+    )
+
+    backend_pdf = st.selectbox(
+        "Leitor de PDF:",
+        options=list(support.BACKENDS_PDF),
+        help="'pdfium' usa a biblioteca nativa e é bem mais rápido em PDFs grandes"
+    )
+
+    esquema_compacto = st.checkbox(
+        "Esquema compacto",
+        help="Guarda o resultado com categorias, Data como data e colunas de minutos; usa bem menos memória"
     )
     
-    pdf_file = st.file_uploader(
-        "Upload do PDF:",
+    pdf_files = st.file_uploader(
+        "Upload dos PDFs:",
         type=["pdf"],
-        help="Faça o upload do PDF de ponto para conversão"
+        accept_multiple_files=True,
+        help="Faça o upload de um ou mais PDFs de ponto; cada um pode ser de um CD"
     )
 
+    # CD de cada PDF enviado
+    cds_arquivos = [
+        st.selectbox(
+            f"CD de {arquivo.name}:",
+            options=CDS,
+            index=CDS.index(cd_selecionado),
+            key=f"cd_{arquivo.file_id}"
+        )
+        for arquivo in pdf_files
+    ]
+
 # Inicializar session state
 if 'df_processed' not in st.session_state:
     st.session_state.df_processed = None
+if 'tarefa' not in st.session_state:
+    st.session_state.tarefa = None
+if 'id_sessao' not in st.session_state:
+    st.session_state.id_sessao = uuid.uuid4().hex
 
-# Processamento do PDF
-if pdf_file:
-    if st.sidebar.button("🚀 Processar PDF", type="primary"):
-    
-        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
-            tmp.write(pdf_file.read())
-            tmp_path = tmp.name
-
-        with st.spinner("Processando PDF..."):
-            try:
-                df_final = support.main(tmp_path)
-                st.session_state.df_processed = df_final
-                st.sidebar.success("✅ Processamento concluído!")
-            except Exception as e:
-                st.sidebar.error(f"❌ Erro ao processar PDF: {e}")
+# Processamento do PDF: cada PDF vira uma tarefa na fila, executada pelos
+# workers compartilhados; o resultado anterior continua disponível nas abas
+# enquanto o novo é processado
+tarefa_em_andamento = st.session_state.tarefa is not None and st.session_state.tarefa.em_andamento
+if pdf_files:
+    if st.sidebar.button("🚀 Processar PDF", type="primary", disabled=tarefa_em_andamento):
+        # PDFs iguais já na fila (de qualquer sessão) são processados uma vez só
+        st.session_state.tarefa = TarefaFila(
+            list(zip(pdf_files, cds_arquivos)), sessao=st.session_state.id_sessao, motor=motor_extracao,
+            backend=backend_pdf, compacto=esquema_compacto, usar_cache=True, incremental=True
+        ).iniciar()
+        st.session_state.mensagem_processamento = None
+
+
+@st.fragment(run_every=1.0)
+def acompanhar_processamento():
+    """
+    Atualiza a barra de progresso a cada segundo sem reexecutar a página;
+    ao fim da tarefa, publica o resultado e recarrega a página inteira.
+    """
+    tarefa = st.session_state.tarefa
+    if tarefa is None:
+        return
+
+    if tarefa.em_andamento:
+        if tarefa.cancelamento_pedido:
+            texto = "Cancelando..."
+        elif tarefa.etapa == 'iniciando' and not tarefa.paginas:
+            texto = "Aguardando na fila..."
+        elif tarefa.etapa in ('iniciando', 'paginas', 'arquivos'):
+            texto = (f"Extraindo páginas: {tarefa.paginas}/{tarefa.total_paginas or '?'} "
+                     f"({tarefa.paginas_por_segundo():.1f} páginas/s)")
+            if len(tarefa.arquivos) > 1:
+                texto += f" · {tarefa.arquivos_concluidos}/{len(tarefa.arquivos)} PDFs"
+        else:
+            texto = f"Etapa {tarefa.etapa}" + (f": {tarefa.concluidos} funcionários" if tarefa.concluidos else "")
+        st.progress(tarefa.fracao_concluida(), text=texto)
+        if st.button("⏹️ Cancelar", disabled=tarefa.cancelamento_pedido):
+            tarefa.cancelar()
+        return
+
+    st.session_state.tarefa = None
+    if tarefa.cancelada:
+        st.session_state.mensagem_processamento = ('warning', "⏹️ Processamento cancelado.")
+    elif tarefa.erro is not None:
+        st.session_state.mensagem_processamento = ('error', f"❌ Erro ao processar PDF: {tarefa.erro}")
+    else:
+        st.session_state.df_processed = tarefa.resultado
+        # Identifica o resultado para reaproveitar os arquivos já exportados
+        st.session_state.id_resultado = uuid.uuid4().hex
+        st.session_state.mensagem_processamento = (
+            'success', f"✅ Processamento concluído! ({len(tarefa.arquivos)} PDF(s), "
+                       f"{tarefa.paginas} páginas em {tarefa.fim - tarefa.inicio:.1f}s)"
+        )
+    st.rerun()
+
+
+with st.sidebar:
+    acompanhar_processamento()
+    mensagem = st.session_state.get('mensagem_processamento')
+    if mensagem:
+        getattr(st, mensagem[0])(mensagem[1])
 
 # Verificar se há dados processados
 if st.session_state.df_processed is not None:
@@ -70,13 +199,25 @@ if st.session_state.df_processed is not None:
     with tab1:
         st.header("📋 Dados Brutos")
         
+        if st.session_state.get('id_resultado') is None:
+            st.session_state.id_resultado = uuid.uuid4().hex
+        indice = indice_filtros(st.session_state.id_resultado, df)
+        
         # Filtros
         col1, col2, col3 = st.columns(3)
         
+        cds_filtro = []
+        if len(indice['cds']) > 1:
+            cds_filtro = st.multiselect(
+                "Filtrar por CD:",
+                options=indice['cds'],
+                help="Selecione os centros de distribuição"
+            )
+        
         with col1:
             colaboradores_filtro = st.multiselect(
                 "Filtrar por Colaborador:",
-                options=df['COLABORADOR'].unique(),
+                options=indice['colaboradores'],
                 help="Selecione colaboradores específicos"
             )
         
@@ -92,33 +233,72 @@ if st.session_state.df_processed is not None:
                 help="Mostrar somente registros com ausências"
             )
         
-        # Aplicar filtros
-        df_filtered = df.copy()
-        df_filtered = df_filtered[['Dia', 'Data', 'COLABORADOR', 'ENTRADA', 'SAIDA INTERVALO', 'VOLTA INTERVALO', 'SAIDA', 'AUSENCIA', 'ALERTA']]
+        # Aplicar filtros: interseção das posições do índice (None = todas as linhas)
+        posicoes = None
+        
+        if cds_filtro:
+            posicoes = intersecao(posicoes, posicoes_dos_valores(indice['posicoes_cd'], cds_filtro))
         
         if colaboradores_filtro:
-            df_filtered = df_filtered[df_filtered['COLABORADOR'].isin(colaboradores_filtro)]
+            posicoes = intersecao(posicoes, posicoes_dos_valores(indice['posicoes_colaborador'], colaboradores_filtro))
         
         if mostrar_apenas_alertas:
-            df_filtered = df_filtered[df_filtered['ALERTA'].notna() & (df_filtered['ALERTA'] != '')]
+            posicoes = intersecao(posicoes, indice['posicoes_alerta'])
         
         if mostrar_apenas_ausencias:
-            df_filtered = df_filtered[df_filtered['AUSENCIA'].notna() & (df_filtered['AUSENCIA'] != '')]
+            posicoes = intersecao(posicoes, indice['posicoes_ausencia'])
+        
+        total_filtrado = len(df) if posicoes is None else len(posicoes)
+        st.subheader(f"📊 Dados Filtrados ({total_filtrado} registros)")
+        
+        # Paginação: só as linhas da página são copiadas e enviadas ao navegador
+        col_tamanho, col_pagina = st.columns([1, 3])
+        with col_tamanho:
+            tamanho_pagina = st.selectbox("Linhas por página:", options=TAMANHOS_PAGINA)
+        total_paginas = max(1, -(-total_filtrado // tamanho_pagina))
+        with col_pagina:
+            pagina = st.number_input(
+                f"Página (de {total_paginas}):",
+                min_value=1,
+                max_value=total_paginas,
+                value=1,
+                # Volta à primeira página quando os filtros ou o resultado mudam
+                key=f"pagina_{st.session_state.id_resultado}_{total_filtrado}_{tamanho_pagina}"
+            )
         
-        st.subheader(f"📊 Dados Filtrados ({len(df_filtered)} registros)")
-        st.dataframe(df_filtered, use_container_width=True)
+        inicio = (int(pagina) - 1) * tamanho_pagina
+        colunas_exibidas = (['CD'] if 'CD' in df.columns else []) + COLUNAS_DADOS_BRUTOS
+        linhas = slice(inicio, inicio + tamanho_pagina) if posicoes is None else posicoes[inicio:inicio + tamanho_pagina]
+        st.dataframe(df.iloc[linhas][colunas_exibidas], use_container_width=True)
     
     with tab2:
         st.header("📥 Downloads")
         
 
         st.subheader("📊 Dados Completos")
-        excel_bytes = df_to_excel(df)
+        formato = st.selectbox(
+            "Formato:",
+            options=list(exportacao.FORMATOS_EXPORTACAO),
+            help="xlsx para o Excel; parquet e csv para outras ferramentas"
+        )
+        particionar_por = st.selectbox(
+            "Planilhas separadas por:",
+            options=['Nenhuma', 'COLABORADOR'] + (['CD'] if 'CD' in df.columns else []),
+            disabled=formato != 'xlsx',
+            help="Cria uma planilha para cada valor da coluna escolhida"
+        )
+
+        arquivo = exportacao.exportar(
+            df, formato,
+            id_resultado=st.session_state.get('id_resultado'),
+            particionar_por=None if particionar_por == 'Nenhuma' or formato != 'xlsx' else particionar_por
+        )
+        nome_cds = '_'.join(str(cd) for cd in sorted(df['CD'].unique())) if 'CD' in df.columns else cd_selecionado
         st.download_button(
-            label="📄 Baixar dados completos (Excel)",
-            data=excel_bytes,
-            file_name=f"CD_{cd_selecionado}_ponto_completo.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            label=f"📄 Baixar dados completos ({formato})",
+            data=arquivo,
+            file_name=f"CD_{nome_cds}_ponto_completo.{formato}",
+            mime=exportacao.FORMATOS_EXPORTACAO[formato]
         )
         
 
@@ -130,7 +310,7 @@ else:
     
     ### 🚀 Como usar:
     1. Selecione o Centro de Distribuição na barra lateral
-    2. Faça upload do arquivo PDF
+    2. Faça upload de um ou mais arquivos PDF e ajuste o CD de cada um
     3. Clique em "Processar PDF"
     4. Explore as diferentes abas com análises e relatórios
     
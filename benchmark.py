@@ -0,0 +1,96 @@
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import support
+from leitores_pdf import abrir_pdf
+
+
+# Combinações (backend, motor) comparadas
+CONFIGURACOES = [
+    ('pdfplumber', 'tabelas'),
+    ('pdfplumber', 'coordenadas'),
+    ('pdfium', 'coordenadas'),
+]
+
+
+def benchmark_motores(caminho_pdf: str, repeticoes: int = 1) -> Dict[Tuple[str, str], float]:
+    """
+    Mede a extração de tabelas (páginas/segundo) para cada backend e motor.
+    """
+    with abrir_pdf(caminho_pdf) as pdf:
+        total_paginas = len(pdf.pages)
+
+    resultados = {}
+    for backend, motor in CONFIGURACOES:
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            support.extrair_tabelas_espelho_ponto(caminho_pdf, motor=motor, backend=backend)
+        duracao = time.perf_counter() - inicio
+        resultados[(backend, motor)] = total_paginas * repeticoes / duracao
+
+    return resultados
+
+
+def comparar_backends(caminho_pdf: str) -> List[str]:
+    """
+    Extrai o PDF com os dois backends e lista as diferenças encontradas
+    entre os DataFrames de cada funcionário. Lista vazia indica paridade.
+    """
+    referencia = support.extrair_tabelas_espelho_ponto(caminho_pdf, backend='pdfplumber')
+    pdfium = support.extrair_tabelas_espelho_ponto(caminho_pdf, backend='pdfium')
+
+    diferencas = []
+    if len(referencia) != len(pdfium):
+        diferencas.append(f"Quantidade de funcionários: {len(referencia)} != {len(pdfium)}")
+
+    for i, (df_ref, df_pdfium) in enumerate(zip(referencia, pdfium)):
+        if not df_ref.equals(df_pdfium):
+            nome = df_ref['COLABORADOR'].iloc[0] if not df_ref.empty else i
+            diferencas.append(f"Tabela divergente: {nome}")
+
+    return diferencas
+
+
+def comparar_motores(caminho_pdf: str, backend: str = 'pdfplumber') -> List[str]:
+    """
+    Extrai o PDF com os dois motores (extract_tables e coordenadas) e lista
+    as diferenças entre os DataFrames de cada funcionário. Lista vazia
+    indica paridade.
+    """
+    referencia = support.extrair_tabelas_espelho_ponto(caminho_pdf, motor='tabelas', backend=backend)
+    coordenadas = support.extrair_tabelas_espelho_ponto(caminho_pdf, motor='coordenadas', backend=backend)
+
+    diferencas = []
+    if len(referencia) != len(coordenadas):
+        diferencas.append(f"Quantidade de funcionários: {len(referencia)} != {len(coordenadas)}")
+
+    for i, (df_ref, df_coordenadas) in enumerate(zip(referencia, coordenadas)):
+        if not df_ref.equals(df_coordenadas):
+            nome = df_ref['COLABORADOR'].iloc[0] if not df_ref.empty else i
+            diferencas.append(f"Tabela divergente: {nome}")
+
+    return diferencas
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Uso: python benchmark.py arquivo.pdf [repeticoes]")
+        sys.exit(1)
+
+    caminho_pdf = sys.argv[1]
+    repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+
+    for (backend, motor), paginas_por_segundo in benchmark_motores(caminho_pdf, repeticoes).items():
+        print(f"{backend:<12} {motor:<12} {paginas_por_segundo:8.2f} páginas/s")
+
+    diferencas = comparar_backends(caminho_pdf)
+    for diferenca in diferencas:
+        print(diferenca)
+    print("Paridade entre backends: " + ("OK" if not diferencas else "FALHOU"))
+
+    diferencas_motores = comparar_motores(caminho_pdf)
+    for diferenca in diferencas_motores:
+        print(diferenca)
+    print("Paridade entre motores: " + ("OK" if not diferencas_motores else "FALHOU"))
+    sys.exit(1 if diferencas or diferencas_motores else 0)
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from io import BytesIO
+from typing import Callable, Dict, Optional, Tuple
+
+import pandas as pd
+import requests
+
+
+# Snapshots da planilha ficam ao lado do app, um CSV + metadados por planilha/aba
+DIRETORIO_SNAPSHOTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshots_horarios')
+
+# Tempo (segundos) em que a planilha em memória é usada sem consultar o Google Sheets
+TTL_PADRAO = 15 * 60
+
+_cache_memoria: Dict[Tuple[str, str], Dict] = {}
+_trava = threading.Lock()
+
+
+def url_planilha(uiid: str, gid: str) -> str:
+    return f'https://docs.google.com/spreadsheets/d/{uiid}/export?gid={gid}&format=csv'
+
+
+def carregar_horarios(uiid: str, gid: str, processar: Callable[[pd.DataFrame], pd.DataFrame],
+                      ttl: float = TTL_PADRAO, offline: bool = False, caminho_csv=None,
+                      diretorio: Optional[str] = None) -> pd.DataFrame:
+    """
+    Carrega a planilha de horários e aplica `processar`, com cache em memória
+    (TTL) e snapshot em disco por planilha/aba.
+
+    - caminho_csv: lê um CSV local e nunca acessa a rede;
+    - offline: usa o último snapshot salvo em disco;
+    - caso contrário, após o TTL faz uma requisição condicional (ETag /
+      Last-Modified) e, se a planilha estiver indisponível, recorre ao snapshot.
+    """
+    if caminho_csv is not None:
+        return processar(pd.read_csv(caminho_csv))
+
+    chave = (uiid, gid)
+    diretorio = diretorio or DIRETORIO_SNAPSHOTS
+    with _trava:
+        agora = time.time()
+        entrada = _cache_memoria.get(chave)
+        if entrada is not None and (offline or agora < entrada['expira_em']):
+            return entrada['dados'].copy()
+
+        metadados = _ler_metadados(diretorio, chave)
+        if offline:
+            if metadados is None:
+                raise FileNotFoundError(f"Nenhum snapshot de horários para a planilha {uiid} (gid {gid}).")
+            conteudo = _ler_snapshot(diretorio, chave)
+        else:
+            try:
+                conteudo, metadados = _baixar_csv(url_planilha(uiid, gid), metadados)
+            except requests.RequestException as e:
+                if metadados is None:
+                    raise
+                print(f"Aviso: planilha de horários indisponível ({e}); usando o último snapshot.")
+                conteudo = None
+
+            if conteudo is None:
+                # 304 Not Modified ou falha de rede: o snapshot continua válido
+                conteudo = _ler_snapshot(diretorio, chave)
+            else:
+                _salvar_snapshot(diretorio, chave, conteudo, metadados)
+
+        versao = hashlib.sha256(conteudo).hexdigest()
+        if entrada is not None and entrada['versao'] == versao:
+            dados = entrada['dados']
+        else:
+            dados = processar(pd.read_csv(BytesIO(conteudo)))
+
+        _cache_memoria[chave] = {'expira_em': agora + ttl, 'versao': versao, 'dados': dados}
+        return dados.copy()
+
+
+def versao_horarios(uiid: str, gid: str, diretorio: Optional[str] = None, caminho_csv=None) -> Optional[str]:
+    """
+    SHA-256 da versão da planilha carregada por último (memória ou snapshot),
+    ou do CSV local quando caminho_csv é informado.
+    """
+    if caminho_csv is not None:
+        with open(caminho_csv, 'rb') as arquivo:
+            return hashlib.sha256(arquivo.read()).hexdigest()
+
+    chave = (uiid, gid)
+    entrada = _cache_memoria.get(chave)
+    if entrada is not None:
+        return entrada['versao']
+    metadados = _ler_metadados(diretorio or DIRETORIO_SNAPSHOTS, chave)
+    return metadados.get('sha256') if metadados else None
+
+
+def limpar_cache_memoria() -> None:
+    """
+    Descarta a planilha em memória, forçando a consulta na próxima carga.
+    """
+    with _trava:
+        _cache_memoria.clear()
+
+
+def _baixar_csv(url: str, metadados: Optional[Dict]) -> Tuple[Optional[bytes], Optional[Dict]]:
+    """
+    Baixa o CSV com requisição condicional. Retorna (None, metadados) quando
+    a planilha não mudou desde o snapshot.
+    """
+    cabecalhos = {}
+    if metadados:
+        if metadados.get('etag'):
+            cabecalhos['If-None-Match'] = metadados['etag']
+        if metadados.get('last_modified'):
+            cabecalhos['If-Modified-Since'] = metadados['last_modified']
+
+    resposta = requests.get(url, headers=cabecalhos, timeout=30)
+    if resposta.status_code == 304 and metadados:
+        return None, metadados
+    resposta.raise_for_status()
+
+    return resposta.content, {
+        'etag': resposta.headers.get('ETag'),
+        'last_modified': resposta.headers.get('Last-Modified'),
+        'sha256': hashlib.sha256(resposta.content).hexdigest(),
+        'baixado_em': time.time(),
+    }
+
+
+def _caminhos(diretorio: str, chave: Tuple[str, str]) -> Tuple[str, str]:
+    base = os.path.join(diretorio, f'{chave[0]}_{chave[1]}')
+    return base + '.csv', base + '.json'
+
+
+def _ler_metadados(diretorio: str, chave: Tuple[str, str]) -> Optional[Dict]:
+    caminho_csv, caminho_json = _caminhos(diretorio, chave)
+    if not (os.path.exists(caminho_csv) and os.path.exists(caminho_json)):
+        return None
+    with open(caminho_json, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def _ler_snapshot(diretorio: str, chave: Tuple[str, str]) -> bytes:
+    caminho_csv, _ = _caminhos(diretorio, chave)
+    with open(caminho_csv, 'rb') as arquivo:
+        return arquivo.read()
+
+
+def _salvar_snapshot(diretorio: str, chave: Tuple[str, str], conteudo: bytes, metadados: Dict) -> None:
+    """
+    Grava o CSV (bytes originais) e os metadados de forma atômica.
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    caminho_csv, caminho_json = _caminhos(diretorio, chave)
+
+    # Temporários com nome único: vários processos (workers da fila, lote)
+    # podem renovar o snapshot ao mesmo tempo
+    sufixo = f'.{os.getpid()}.{threading.get_ident()}.tmp'
+
+    with open(caminho_csv + sufixo, 'wb') as arquivo:
+        arquivo.write(conteudo)
+    os.replace(caminho_csv + sufixo, caminho_csv)
+
+    with open(caminho_json + sufixo, 'w', encoding='utf-8') as arquivo:
+        json.dump(metadados, arquivo)
+    os.replace(caminho_json + sufixo, caminho_json)
@@ -0,0 +1,240 @@
+import hashlib
+import os
+import pickle
+import threading
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Set
+
+import pandas as pd
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import PDFObjRef, PDFStream
+
+
+# Resultados processados ficam ao lado do app, um Parquet por chave
+DIRETORIO_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache_resultados')
+
+# Tamanho máximo (bytes) do diretório; os resultados usados há mais tempo saem primeiro
+TAMANHO_MAXIMO_PADRAO = 512 * 1024 * 1024
+
+# Extrações por página ficam num subdiretório, com limite próprio
+SUBDIRETORIO_PAGINAS = 'paginas'
+TAMANHO_MAXIMO_PAGINAS = 256 * 1024 * 1024
+
+# Versão do cálculo da impressão digital; entra na chave das páginas salvas,
+# invalidando as impressões calculadas de outra forma
+VERSAO_IMPRESSAO = 2
+
+_trava = threading.Lock()
+
+
+def hash_pdf(pdf) -> str:
+    """
+    SHA-256 do conteúdo do PDF, a partir do caminho ou dos bytes.
+    """
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(pdf).hexdigest()
+
+    sha = hashlib.sha256()
+    with open(pdf, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(1024 * 1024), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def chave_resultado(pdf, cd, versao_horarios: Optional[str], variante: str = '') -> str:
+    """
+    Chave do resultado: conteúdo do PDF, CD, versão da planilha de horários
+    e as opções de extração que podem alterar o resultado.
+    """
+    partes = [hash_pdf(pdf), str(cd), versao_horarios or '', variante]
+    return hashlib.sha256('|'.join(partes).encode('utf-8')).hexdigest()
+
+
+def carregar_resultado(chave: str, diretorio: Optional[str] = None) -> Optional[pd.DataFrame]:
+    """
+    Resultado salvo para a chave, ou None. Um acerto renova a posição do
+    resultado na fila de descarte.
+    """
+    caminho = _caminho(diretorio or DIRETORIO_RESULTADOS, chave)
+    try:
+        resultado = pd.read_parquet(caminho)
+    except FileNotFoundError:
+        return None
+
+    try:
+        os.utime(caminho)
+    except OSError:
+        pass
+    return resultado
+
+
+def salvar_resultado(chave: str, resultado: pd.DataFrame, diretorio: Optional[str] = None,
+                     tamanho_maximo: int = TAMANHO_MAXIMO_PADRAO) -> None:
+    """
+    Grava o resultado em Parquet de forma atômica e descarta os mais
+    antigos até o diretório caber em tamanho_maximo.
+    """
+    diretorio = diretorio or DIRETORIO_RESULTADOS
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = _caminho(diretorio, chave)
+
+    temporario = f'{caminho}.{os.getpid()}.{threading.get_ident()}.tmp'
+    resultado.to_parquet(temporario)
+    os.replace(temporario, caminho)
+
+    _aplicar_limite(diretorio, tamanho_maximo)
+
+
+def limpar_cache(diretorio: Optional[str] = None) -> None:
+    """
+    Remove todos os resultados e extrações de página salvos.
+    """
+    diretorio = diretorio or DIRETORIO_RESULTADOS
+    _aplicar_limite(diretorio, 0)
+    _aplicar_limite(os.path.join(diretorio, SUBDIRETORIO_PAGINAS), 0, '.pkl')
+
+
+def impressoes_paginas(pdf) -> List[str]:
+    """
+    Impressão digital (SHA-256) de cada página: tamanho e rotação, fluxos
+    de conteúdo brutos e toda a árvore de recursos (XObjects, fontes etc.),
+    já que o conteúdo pode estar todo num XObject de formulário. Páginas
+    reexportadas sem alteração mantêm a impressão, mesmo que mudem de
+    posição no arquivo.
+    """
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        arquivo = BytesIO(pdf)
+    else:
+        arquivo = open(pdf, 'rb')
+
+    impressoes = []
+    # Resumo de cada objeto indireto, calculado uma vez por documento
+    # (fontes e XObjects costumam ser compartilhados entre as páginas)
+    resumos: Dict[int, bytes] = {}
+    with arquivo:
+        documento = PDFDocument(PDFParser(arquivo))
+        for pagina in PDFPage.create_pages(documento):
+            sha = hashlib.sha256(repr((pagina.mediabox, pagina.cropbox, pagina.rotate)).encode('ascii'))
+            for fluxo in pagina.contents:
+                sha.update(_resumo_objeto(fluxo, resumos, set()))
+            sha.update(_resumo_objeto(pagina.resources, resumos, set()))
+            impressoes.append(sha.hexdigest())
+    return impressoes
+
+
+def _resumo_objeto(objeto: Any, resumos: Dict[int, bytes], em_andamento: Set[int]) -> bytes:
+    """
+    SHA-256 do objeto do PDF e de tudo o que ele referencia, sem depender
+    dos números dos objetos (que mudam numa reexportação).
+    """
+    if isinstance(objeto, PDFObjRef):
+        objid = objeto.objid
+        if objid in resumos:
+            return resumos[objid]
+        if objid in em_andamento:
+            return b'ciclo'
+        em_andamento.add(objid)
+        resumo = _resumo_objeto(objeto.resolve(), resumos, em_andamento)
+        em_andamento.discard(objid)
+        resumos[objid] = resumo
+        return resumo
+
+    sha = hashlib.sha256()
+    if isinstance(objeto, PDFStream):
+        sha.update(b'stream')
+        sha.update(_resumo_objeto(objeto.attrs, resumos, em_andamento))
+        dados = objeto.get_rawdata()
+        sha.update(dados if dados is not None else objeto.get_data())
+    elif isinstance(objeto, dict):
+        sha.update(b'dict')
+        for chave in sorted(objeto, key=str):
+            sha.update(str(chave).encode('utf-8', 'surrogateescape'))
+            sha.update(_resumo_objeto(objeto[chave], resumos, em_andamento))
+    elif isinstance(objeto, (list, tuple)):
+        sha.update(b'list')
+        for item in objeto:
+            sha.update(_resumo_objeto(item, resumos, em_andamento))
+    else:
+        sha.update(repr(objeto).encode('utf-8', 'surrogateescape'))
+    return sha.digest()
+
+
+def carregar_paginas(impressoes: List[str], variante: str, diretorio: Optional[str] = None) -> List[Optional[Any]]:
+    """
+    Extração salva de cada página (ou None), pela impressão da página e
+    pelas opções de extração.
+    """
+    diretorio = _diretorio_paginas(diretorio)
+    paginas = []
+    for impressao in impressoes:
+        caminho = _caminho_pagina(diretorio, impressao, variante)
+        try:
+            with open(caminho, 'rb') as arquivo:
+                paginas.append(pickle.load(arquivo))
+        except FileNotFoundError:
+            paginas.append(None)
+            continue
+        try:
+            os.utime(caminho)
+        except OSError:
+            pass
+    return paginas
+
+
+def salvar_paginas(extraidas: Dict[str, Any], variante: str, diretorio: Optional[str] = None,
+                   tamanho_maximo: int = TAMANHO_MAXIMO_PAGINAS) -> None:
+    """
+    Grava a extração de cada página (impressão -> resultado de extrair_pagina).
+    """
+    diretorio = _diretorio_paginas(diretorio)
+    os.makedirs(diretorio, exist_ok=True)
+
+    for impressao, extracao in extraidas.items():
+        caminho = _caminho_pagina(diretorio, impressao, variante)
+        temporario = f'{caminho}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporario, 'wb') as arquivo:
+            pickle.dump(extracao, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporario, caminho)
+
+    _aplicar_limite(diretorio, tamanho_maximo, '.pkl')
+
+
+def _caminho(diretorio: str, chave: str) -> str:
+    return os.path.join(diretorio, chave + '.parquet')
+
+
+def _diretorio_paginas(diretorio: Optional[str]) -> str:
+    return diretorio or os.path.join(DIRETORIO_RESULTADOS, SUBDIRETORIO_PAGINAS)
+
+
+def _caminho_pagina(diretorio: str, impressao: str, variante: str) -> str:
+    chave = hashlib.sha256(f'{VERSAO_IMPRESSAO}|{impressao}|{variante}'.encode('utf-8')).hexdigest()
+    return os.path.join(diretorio, chave + '.pkl')
+
+
+def _aplicar_limite(diretorio: str, tamanho_maximo: int, extensao: str = '.parquet') -> None:
+    with _trava:
+        try:
+            nomes = [nome for nome in os.listdir(diretorio) if nome.endswith(extensao)]
+        except FileNotFoundError:
+            return
+
+        arquivos = []
+        for nome in nomes:
+            try:
+                estado = os.stat(os.path.join(diretorio, nome))
+            except FileNotFoundError:
+                continue
+            arquivos.append((estado.st_mtime, estado.st_size, nome))
+
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        for _, tamanho, nome in sorted(arquivos):
+            if total <= tamanho_maximo:
+                break
+            try:
+                os.remove(os.path.join(diretorio, nome))
+            except FileNotFoundError:
+                pass
+            total -= tamanho
@@ -0,0 +1,215 @@
+import re
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import xlsxwriter
+from xlsxwriter.utility import xl_col_to_name
+
+
+# Formatos de exportação e o tipo MIME de cada um
+FORMATOS_EXPORTACAO = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'parquet': 'application/vnd.apache.parquet',
+    'csv': 'text/csv',
+}
+
+# Limite de linhas de uma planilha do Excel (o cabeçalho ocupa a primeira)
+MAX_LINHAS_PLANILHA = 1048576 - 1
+
+# Linhas convertidas para objetos Python de cada vez ao gravar a planilha:
+# com constant_memory, só um bloco fica em memória além do DataFrame
+LINHAS_POR_BLOCO = 10000
+
+# Valores das colunas de status destacados como problema
+STATUS_PROBLEMA = ('SEM MARCAÇÃO', 'ATRASO', 'SAIDA ANTECIPADA')
+COLUNAS_STATUS = ('ENTRADA', 'SAIDA INTERVALO', 'VOLTA INTERVALO', 'SAIDA')
+
+# Arquivos já gerados, por (id do resultado, formato, opções)
+MAX_EXPORTACOES = 16
+_exportacoes: 'OrderedDict[Tuple, bytes]' = OrderedDict()
+_trava = threading.Lock()
+
+
+def exportar(df: pd.DataFrame, formato: str, id_resultado: Optional[str] = None,
+             particionar_por: Optional[str] = None) -> bytes:
+    """
+    Gera o arquivo no formato pedido. Com id_resultado, os bytes ficam
+    guardados e são reaproveitados nas próximas chamadas com o mesmo id,
+    sem gerar o arquivo nem percorrer o DataFrame de novo.
+    """
+    if formato not in FORMATOS_EXPORTACAO:
+        raise ValueError(f"Formato de exportação inválido: {formato}")
+
+    chave = (id_resultado, formato, particionar_por)
+    if id_resultado is not None:
+        with _trava:
+            if chave in _exportacoes:
+                _exportacoes.move_to_end(chave)
+                return _exportacoes[chave]
+
+    if formato == 'xlsx':
+        conteudo = exportar_excel(df, particionar_por=particionar_por)
+    elif formato == 'parquet':
+        conteudo = exportar_parquet(df)
+    else:
+        conteudo = exportar_csv(df)
+
+    if id_resultado is not None:
+        with _trava:
+            _exportacoes[chave] = conteudo
+            while len(_exportacoes) > MAX_EXPORTACOES:
+                _exportacoes.popitem(last=False)
+    return conteudo
+
+
+def exportar_excel(df: pd.DataFrame, destino=None, particionar_por: Optional[str] = None,
+                   nome_planilha: str = 'Dados_Consolidados') -> Optional[bytes]:
+    """
+    Grava o DataFrame em xlsx linha a linha (constant_memory do xlsxwriter).
+    Com particionar_por (ex.: 'COLABORADOR' ou 'CD'), cada valor da coluna
+    vai para uma planilha. Linhas com alerta e status com problema são
+    destacados por formatação condicional. Sem destino, retorna os bytes.
+    """
+    if particionar_por is not None and particionar_por not in df.columns:
+        raise ValueError(f"Coluna de particionamento inexistente: {particionar_por}")
+
+    saida = BytesIO() if destino is None else destino
+    livro = xlsxwriter.Workbook(saida, {'constant_memory': True})
+    formatos = {
+        'cabecalho': livro.add_format({'bold': True}),
+        'data': livro.add_format({'num_format': 'dd/mm/yyyy'}),
+        'alerta': livro.add_format({'bg_color': '#FFE5E5'}),
+        'problema': livro.add_format({'font_color': '#9C0006', 'bold': True}),
+    }
+
+    nomes_usados = set()
+    for nome, parte in _partes(df, particionar_por, nome_planilha):
+        for inicio in range(0, max(len(parte), 1), MAX_LINHAS_PLANILHA):
+            pedaco = parte.iloc[inicio:inicio + MAX_LINHAS_PLANILHA]
+            planilha = livro.add_worksheet(_nome_planilha(nome, nomes_usados))
+            _escrever_planilha(planilha, pedaco, formatos)
+
+    livro.close()
+    return saida.getvalue() if destino is None else None
+
+
+def exportar_parquet(df: pd.DataFrame, destino=None) -> Optional[bytes]:
+    """
+    Grava o DataFrame em Parquet. Sem destino, retorna os bytes.
+    """
+    saida = BytesIO() if destino is None else destino
+    df.to_parquet(saida, index=False)
+    return saida.getvalue() if destino is None else None
+
+
+def exportar_csv(df: pd.DataFrame, destino=None) -> Optional[bytes]:
+    """
+    Grava o DataFrame em CSV (UTF-8). Sem destino, retorna os bytes.
+    """
+    if destino is not None:
+        df.to_csv(destino, index=False, encoding='utf-8')
+        return None
+    return df.to_csv(index=False).encode('utf-8')
+
+
+def exportar_arquivo(df: pd.DataFrame, caminho: str, formato: Optional[str] = None) -> None:
+    """
+    Grava o DataFrame no caminho. Sem formato, usa a extensão do arquivo.
+    """
+    formato = formato or caminho.rsplit('.', 1)[-1].lower()
+    if formato == 'xlsx':
+        exportar_excel(df, caminho)
+    elif formato == 'parquet':
+        exportar_parquet(df, caminho)
+    elif formato == 'csv':
+        exportar_csv(df, caminho)
+    else:
+        raise ValueError(f"Formato de exportação inválido: {formato}")
+
+
+def limpar_exportacoes() -> None:
+    """
+    Descarta os arquivos já gerados.
+    """
+    with _trava:
+        _exportacoes.clear()
+
+
+def _partes(df: pd.DataFrame, particionar_por: Optional[str], nome_planilha: str) -> Iterator[Tuple[str, pd.DataFrame]]:
+    if particionar_por is None:
+        yield nome_planilha, df
+        return
+
+    for valor, parte in df.groupby(particionar_por, sort=False, observed=True, dropna=False):
+        yield ('' if pd.isna(valor) else str(valor)) or 'Sem valor', parte
+
+
+def _nome_planilha(nome: str, nomes_usados: set) -> str:
+    """
+    Nome válido e único para a planilha (até 31 caracteres, sem []:*?/\\).
+    """
+    base = re.sub(r'[\[\]:*?/\\]', '_', nome).strip("'")[:31] or 'Planilha'
+    candidato, n = base, 2
+    while candidato.lower() in nomes_usados:
+        sufixo = f' ({n})'
+        candidato, n = base[:31 - len(sufixo)] + sufixo, n + 1
+    nomes_usados.add(candidato.lower())
+    return candidato
+
+
+def _escrever_planilha(planilha, df: pd.DataFrame, formatos: Dict) -> None:
+    colunas = list(df.columns)
+    planilha.write_row(0, 0, colunas, formatos['cabecalho'])
+    planilha.freeze_panes(1, 0)
+
+    datas = [pd.api.types.is_datetime64_any_dtype(df[coluna]) for coluna in colunas]
+    for inicio in range(0, len(df), LINHAS_POR_BLOCO):
+        bloco = df.iloc[inicio:inicio + LINHAS_POR_BLOCO]
+        valores = [_valores_coluna(bloco[coluna]) for coluna in colunas]
+        for linha, registro in enumerate(zip(*valores), start=inicio + 1):
+            for j, valor in enumerate(registro):
+                if valor is None:
+                    continue
+                if datas[j]:
+                    planilha.write_datetime(linha, j, valor, formatos['data'])
+                else:
+                    planilha.write(linha, j, valor)
+
+    ultima_linha = len(df)
+    if ultima_linha == 0:
+        return
+
+    # Destaques por intervalo, sem formatar célula a célula
+    ultima_coluna = len(colunas) - 1
+    if 'ALERTA' in colunas:
+        letra = xl_col_to_name(colunas.index('ALERTA'))
+        planilha.conditional_format(1, 0, ultima_linha, ultima_coluna, {
+            'type': 'formula',
+            'criteria': f'=${letra}2<>""',
+            'format': formatos['alerta'],
+        })
+    for coluna in COLUNAS_STATUS:
+        if coluna in colunas:
+            j = colunas.index(coluna)
+            for status in STATUS_PROBLEMA:
+                planilha.conditional_format(1, j, ultima_linha, j, {
+                    'type': 'cell',
+                    'criteria': '==',
+                    'value': f'"{status}"',
+                    'format': formatos['problema'],
+                })
+
+
+def _valores_coluna(serie: pd.Series) -> List:
+    """
+    Valores da coluna prontos para o xlsxwriter: nulos viram None e datas
+    viram datetime.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return [None if pd.isna(v) else v.to_pydatetime() for v in serie]
+
+    valores = serie.tolist()
+    return [None if v is None or (not isinstance(v, str) and pd.isna(v)) else v for v in valores]
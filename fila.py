@@ -0,0 +1,640 @@
+import argparse
+import contextlib
+import fcntl
+import hashlib
+import json
+import multiprocessing
+import os
+import secrets
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from typing import IO, Any, Dict, List, Optional
+
+import pandas as pd
+
+import cache_resultados
+import support
+from leitores_pdf import EntradaPdf, normalizar_entrada_pdf
+
+
+# Banco, PDFs enfileirados e resultados ficam ao lado do app
+DIRETORIO_FILA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fila_tarefas')
+NOME_BANCO = 'fila.sqlite3'
+NOME_PID_SERVICO = 'servico.pid'
+NOME_LOG_SERVICO = 'servico.log'
+
+# Travas de arquivo (fcntl.flock, só em sistemas POSIX) que indicam os
+# processos vivos: o serviço segura a sua enquanto executa e cada worker
+# segura uma própria. O sistema solta a trava quando o processo morre, e
+# um pid reaproveitado por outro processo não passa por vivo
+NOME_TRAVA_SERVICO = 'servico.lock'
+NOME_TRAVA_PARTIDA = 'partida.lock'
+DIRETORIO_TRAVAS_WORKERS = 'workers'
+
+# Tempo (segundos) que um serviço novo espera pela trava do serviço, que
+# pode estar presa um instante por garantir_servico
+ESPERA_TRAVA_SERVICO = 2.0
+
+# Estados de uma tarefa; as ativas podem receber novos interessados (deduplicação)
+ESTADOS_ATIVOS = ('pendente', 'executando')
+ESTADOS_FINAIS = ('concluida', 'erro', 'cancelada')
+
+# Intervalos (segundos) entre consultas de um worker ocioso e entre
+# gravações do progresso de uma tarefa
+INTERVALO_CONSULTA = 0.5
+INTERVALO_PROGRESSO = 0.5
+
+# Tempo (segundos) que as tarefas finalizadas e os resultados ficam no banco
+# e intervalo entre as limpezas feitas pelo serviço
+IDADE_MAXIMA_FINALIZADAS = 7 * 24 * 60 * 60
+INTERVALO_LIMPEZA = 60 * 60
+
+# Execuções de uma tarefa interrompidas pela morte do worker (falta de
+# memória, falha do pdfium) antes de ela ser marcada como erro
+MAX_TENTATIVAS = 3
+
+# Opções de support.main aceitas numa tarefa; a extração de cada tarefa usa
+# um único processo, o paralelismo vem do número de workers da fila
+OPCOES_TAREFA = ('motor', 'backend', 'horarios_csv', 'horarios_offline', 'usar_cache', 'incremental')
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS tarefas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chave TEXT NOT NULL,
+    hash_pdf TEXT NOT NULL,
+    cd TEXT NOT NULL,
+    opcoes TEXT NOT NULL,
+    sessao TEXT,
+    estado TEXT NOT NULL,
+    interessados INTEGER NOT NULL DEFAULT 1,
+    pid INTEGER,
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    trabalhador TEXT,
+    etapa TEXT,
+    paginas INTEGER NOT NULL DEFAULT 0,
+    total_paginas INTEGER NOT NULL DEFAULT 0,
+    erro TEXT,
+    criada_em REAL NOT NULL,
+    iniciada_em REAL,
+    concluida_em REAL
+);
+CREATE INDEX IF NOT EXISTS tarefas_estado ON tarefas (estado, id);
+CREATE INDEX IF NOT EXISTS tarefas_chave ON tarefas (chave, estado);
+"""
+
+# Colunas acrescentadas depois da primeira versão do esquema, adicionadas
+# aos bancos já existentes
+_COLUNAS_ADICIONADAS = (
+    ('tentativas', 'INTEGER NOT NULL DEFAULT 0'),
+    ('trabalhador', 'TEXT'),
+)
+
+_trava = threading.Lock()
+_bancos_criados = set()
+# Serviços iniciados por este processo, para recolher os que terminarem
+_servicos_iniciados: Dict[str, subprocess.Popen] = {}
+
+
+def enfileirar(pdf: EntradaPdf, cd=None, sessao: Optional[str] = None, diretorio: Optional[str] = None,
+               **opcoes) -> int:
+    """
+    Coloca o PDF na fila e retorna o id da tarefa. Se já houver uma tarefa
+    ativa com o mesmo PDF, CD e opções, retorna o id dela em vez de criar
+    outra (o PDF é processado uma vez só).
+    """
+    invalidas = set(opcoes) - set(OPCOES_TAREFA)
+    if invalidas:
+        raise ValueError(f"Opções inválidas para a fila: {', '.join(sorted(invalidas))}")
+
+    diretorio = diretorio or DIRETORIO_FILA
+    pdf = normalizar_entrada_pdf(pdf)
+    hash_pdf = cache_resultados.hash_pdf(pdf)
+    cd_json = json.dumps(cd)
+    opcoes_json = json.dumps(opcoes, sort_keys=True)
+    chave = hashlib.sha256(f'{hash_pdf}|{cd_json}|{opcoes_json}'.encode('utf-8')).hexdigest()
+
+    with _conectar(diretorio) as conexao:
+        # O PDF é gravado dentro da transação: _remover_pdf_sem_uso não o
+        # apaga entre a gravação e a criação da tarefa
+        conexao.execute('BEGIN IMMEDIATE')
+        _salvar_pdf(diretorio, hash_pdf, pdf)
+        linha = conexao.execute(
+            'SELECT id FROM tarefas WHERE chave = ? AND estado IN (?, ?) ORDER BY id LIMIT 1',
+            (chave, *ESTADOS_ATIVOS)
+        ).fetchone()
+        if linha is not None:
+            conexao.execute('UPDATE tarefas SET interessados = interessados + 1 WHERE id = ?', (linha[0],))
+            conexao.execute('COMMIT')
+            return linha[0]
+
+        cursor = conexao.execute(
+            'INSERT INTO tarefas (chave, hash_pdf, cd, opcoes, sessao, estado, criada_em) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (chave, hash_pdf, cd_json, opcoes_json, sessao, 'pendente', time.time())
+        )
+        conexao.execute('COMMIT')
+        return cursor.lastrowid
+
+
+def consultar(ids: List[int], diretorio: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Estado atual das tarefas, na ordem dos ids (as já removidas por
+    limpar_finalizadas ficam de fora).
+    """
+    if not ids:
+        return []
+    with _conectar(diretorio or DIRETORIO_FILA) as conexao:
+        linhas = conexao.execute(
+            f'SELECT * FROM tarefas WHERE id IN ({",".join("?" * len(ids))})', list(ids)
+        ).fetchall()
+    por_id = {linha['id']: dict(linha, cd=json.loads(linha['cd'])) for linha in linhas}
+    return [por_id[id_tarefa] for id_tarefa in ids if id_tarefa in por_id]
+
+
+def carregar_resultado(id_tarefa: int, diretorio: Optional[str] = None) -> Optional[pd.DataFrame]:
+    """
+    Resultado da tarefa concluída, ou None.
+    """
+    try:
+        return pd.read_parquet(_caminho_resultado(diretorio or DIRETORIO_FILA, id_tarefa))
+    except FileNotFoundError:
+        return None
+
+
+def cancelar(id_tarefa: int, diretorio: Optional[str] = None) -> None:
+    """
+    Retira o interesse na tarefa. Ela só é cancelada quando ninguém mais
+    aguarda o resultado; em execução, para na próxima gravação de progresso.
+    """
+    diretorio = diretorio or DIRETORIO_FILA
+    with _conectar(diretorio) as conexao:
+        conexao.execute('BEGIN IMMEDIATE')
+        conexao.execute(
+            'UPDATE tarefas SET interessados = interessados - 1 WHERE id = ? AND estado IN (?, ?)',
+            (id_tarefa, *ESTADOS_ATIVOS)
+        )
+        conexao.execute(
+            'UPDATE tarefas SET estado = ?, concluida_em = ? WHERE id = ? AND interessados <= 0 AND estado = ?',
+            ('cancelada', time.time(), id_tarefa, 'pendente')
+        )
+        conexao.execute(
+            'UPDATE tarefas SET estado = ? WHERE id = ? AND interessados <= 0 AND estado = ?',
+            ('cancelada', id_tarefa, 'executando')
+        )
+        linha = conexao.execute('SELECT hash_pdf, estado FROM tarefas WHERE id = ?', (id_tarefa,)).fetchone()
+        conexao.execute('COMMIT')
+
+    if linha is not None and linha['estado'] == 'cancelada':
+        _remover_pdf_sem_uso(diretorio, linha['hash_pdf'])
+
+
+def recolocar_interrompidas(diretorio: Optional[str] = None) -> int:
+    """
+    Devolve à fila as tarefas em execução cujo worker não existe mais (ex.:
+    o serviço foi reiniciado ou o worker morreu). A tarefa que já derrubou o
+    worker MAX_TENTATIVAS vezes vira erro. Retorna quantas foram recolocadas.
+    """
+    diretorio = diretorio or DIRETORIO_FILA
+    with _conectar(diretorio) as conexao:
+        conexao.execute('BEGIN IMMEDIATE')
+        linhas = conexao.execute('SELECT id, trabalhador, hash_pdf, tentativas FROM tarefas WHERE estado = ?',
+                                 ('executando',)).fetchall()
+        orfas = [linha for linha in linhas if not _worker_vivo(diretorio, linha['trabalhador'])]
+        recolocadas = [linha['id'] for linha in orfas if linha['tentativas'] < MAX_TENTATIVAS]
+        esgotadas = [linha for linha in orfas if linha['tentativas'] >= MAX_TENTATIVAS]
+        conexao.executemany(
+            'UPDATE tarefas SET estado = ?, pid = NULL, etapa = NULL, paginas = 0 WHERE id = ?',
+            [('pendente', id_tarefa) for id_tarefa in recolocadas]
+        )
+        conexao.executemany(
+            'UPDATE tarefas SET estado = ?, erro = ?, concluida_em = ? WHERE id = ?',
+            [('erro', f"O processamento foi interrompido {linha['tentativas']} vez(es) pela queda do worker.",
+              time.time(), linha['id']) for linha in esgotadas]
+        )
+        conexao.execute('COMMIT')
+
+    for hash_pdf in {linha['hash_pdf'] for linha in esgotadas}:
+        _remover_pdf_sem_uso(diretorio, hash_pdf)
+    return len(recolocadas)
+
+
+def limpar_finalizadas(idade_maxima: float = IDADE_MAXIMA_FINALIZADAS, diretorio: Optional[str] = None) -> int:
+    """
+    Remove as tarefas finalizadas há mais de idade_maxima segundos e os
+    seus resultados. Retorna quantas foram removidas.
+    """
+    diretorio = diretorio or DIRETORIO_FILA
+    limite = time.time() - idade_maxima
+    with _conectar(diretorio) as conexao:
+        conexao.execute('BEGIN IMMEDIATE')
+        ids = [linha[0] for linha in conexao.execute(
+            'SELECT id FROM tarefas WHERE estado IN (?, ?, ?) AND concluida_em < ?', (*ESTADOS_FINAIS, limite)
+        )]
+        conexao.executemany('DELETE FROM tarefas WHERE id = ?', [(id_tarefa,) for id_tarefa in ids])
+        conexao.execute('COMMIT')
+
+    for id_tarefa in ids:
+        try:
+            os.remove(_caminho_resultado(diretorio, id_tarefa))
+        except FileNotFoundError:
+            pass
+    return len(ids)
+
+
+def garantir_servico(num_workers: int = 1, diretorio: Optional[str] = None) -> Optional[int]:
+    """
+    Inicia o serviço da fila (python fila.py) num processo próprio, se ainda
+    não houver um em execução, e retorna o pid dele. O serviço não depende
+    de quem o iniciou: reiniciar o app não interrompe as tarefas.
+    """
+    diretorio = os.path.abspath(diretorio or DIRETORIO_FILA)
+    os.makedirs(diretorio, exist_ok=True)
+    # A verificação e a partida ficam sob uma trava de arquivo: duas sessões
+    # do app chamando ao mesmo tempo não iniciam dois serviços
+    with _travar(os.path.join(diretorio, NOME_TRAVA_PARTIDA)):
+        # Recolhe o serviço iniciado por este processo que tenha terminado
+        # (sem isso ele fica zumbi); enquanto ele não termina, pode estar
+        # ainda carregando, antes de pegar a trava do serviço
+        anterior = _servicos_iniciados.get(diretorio)
+        if anterior is not None and anterior.poll() is not None:
+            del _servicos_iniciados[diretorio]
+            anterior = None
+
+        if _trava_presa(os.path.join(diretorio, NOME_TRAVA_SERVICO)):
+            return _ler_pid_servico(diretorio)
+        if anterior is not None:
+            return anterior.pid
+
+        with open(os.path.join(diretorio, NOME_LOG_SERVICO), 'ab') as log:
+            processo = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), '--workers', str(num_workers), '--diretorio', diretorio],
+                stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, start_new_session=True,
+            )
+        _servicos_iniciados[diretorio] = processo
+        # Grava o pid já aqui para que chamadas seguidas não iniciem outro serviço
+        with open(os.path.join(diretorio, NOME_PID_SERVICO), 'w') as arquivo:
+            arquivo.write(str(processo.pid))
+    return processo.pid
+
+
+class ServicoFila:
+    """
+    Pool fixo de processos que executam as tarefas da fila. Só um serviço
+    executa por diretório: ele segura a trava NOME_TRAVA_SERVICO enquanto
+    estiver em execução.
+    """
+
+    def __init__(self, num_workers: int = 1, diretorio: Optional[str] = None,
+                 idade_maxima: float = IDADE_MAXIMA_FINALIZADAS):
+        self.num_workers = num_workers
+        self.diretorio = diretorio or DIRETORIO_FILA
+        self.idade_maxima = idade_maxima
+        # spawn: o processo pai pode ter threads (ex.: o servidor do Streamlit)
+        self._contexto = multiprocessing.get_context('spawn')
+        self._parar = self._contexto.Event()
+        self._processos = []
+        self._trava: Optional[IO] = None
+
+    def iniciar(self) -> 'ServicoFila':
+        """
+        Inicia os workers. Levanta RuntimeError se outro serviço já estiver
+        em execução no diretório.
+        """
+        os.makedirs(self.diretorio, exist_ok=True)
+        self._trava = _obter_trava(os.path.join(self.diretorio, NOME_TRAVA_SERVICO), ESPERA_TRAVA_SERVICO)
+        if self._trava is None:
+            raise RuntimeError(f"Já há um serviço da fila em execução em {self.diretorio}.")
+        recolocar_interrompidas(self.diretorio)
+        with open(os.path.join(self.diretorio, NOME_PID_SERVICO), 'w') as arquivo:
+            arquivo.write(str(os.getpid()))
+        self._processos = [self._iniciar_worker() for _ in range(self.num_workers)]
+        return self
+
+    def _iniciar_worker(self):
+        processo = self._contexto.Process(target=executar_worker, args=(self.diretorio, self._parar), daemon=True)
+        processo.start()
+        return processo
+
+    def parar(self, tempo_limite: Optional[float] = None) -> None:
+        """
+        Para os workers após a tarefa atual de cada um.
+        """
+        self._parar.set()
+        for processo in self._processos:
+            processo.join(tempo_limite)
+        if _ler_pid_servico(self.diretorio) == os.getpid():
+            os.remove(os.path.join(self.diretorio, NOME_PID_SERVICO))
+        if self._trava is not None:
+            self._trava.close()
+            self._trava = None
+
+    @property
+    def em_execucao(self) -> bool:
+        return any(processo.is_alive() for processo in self._processos)
+
+    def substituir_workers_encerrados(self) -> int:
+        """
+        Devolve à fila as tarefas dos workers que morreram (ex.: falta de
+        memória) e inicia outros no lugar. Retorna quantos foram substituídos.
+        """
+        if self._parar.is_set():
+            return 0
+        encerrados = [i for i, processo in enumerate(self._processos) if not processo.is_alive()]
+        if not encerrados:
+            return 0
+
+        for i in encerrados:
+            processo = self._processos[i]
+            processo.join()
+            print(f"Worker {processo.pid} encerrado (código {processo.exitcode}); iniciando outro.", flush=True)
+        recolocar_interrompidas(self.diretorio)
+        for i in encerrados:
+            self._processos[i] = self._iniciar_worker()
+        return len(encerrados)
+
+    def aguardar(self) -> None:
+        """
+        Laço principal do serviço até o pedido de parada: substitui os
+        workers que morrerem e, a cada INTERVALO_LIMPEZA, remove as tarefas
+        finalizadas antigas.
+        """
+        ultima_limpeza = 0.0
+        while not self._parar.is_set():
+            self.substituir_workers_encerrados()
+            if time.time() - ultima_limpeza >= INTERVALO_LIMPEZA:
+                removidas = limpar_finalizadas(self.idade_maxima, self.diretorio)
+                if removidas:
+                    print(f"{removidas} tarefa(s) finalizada(s) removida(s) da fila.", flush=True)
+                ultima_limpeza = time.time()
+            time.sleep(1)
+
+
+def executar_worker(diretorio: str, parar) -> None:
+    """
+    Laço de um worker: reserva a próxima tarefa e a executa até `parar` ou
+    até o processo do serviço deixar de existir. O worker segura uma trava
+    própria, pela qual recolocar_interrompidas sabe se ele ainda vive.
+    """
+    pai = os.getppid()
+    trabalhador = f'{os.getpid()}-{secrets.token_hex(8)}'
+    caminho_trava = _caminho_trava_worker(diretorio, trabalhador)
+    os.makedirs(os.path.dirname(caminho_trava), exist_ok=True)
+    trava = _obter_trava(caminho_trava)
+    try:
+        while not parar.is_set() and os.getppid() == pai:
+            tarefa = _reservar(diretorio, trabalhador)
+            if tarefa is None:
+                parar.wait(INTERVALO_CONSULTA)
+                continue
+            executar_tarefa(tarefa, diretorio)
+    finally:
+        os.remove(caminho_trava)
+        trava.close()
+
+
+def executar_tarefa(tarefa: Dict[str, Any], diretorio: str) -> None:
+    """
+    Executa support.main para a tarefa reservada e grava o resultado.
+    """
+    id_tarefa = tarefa['id']
+    ultima_gravacao = [0.0]
+
+    def progresso(etapa: str, concluidos: int, total: int) -> None:
+        agora = time.time()
+        if etapa == 'paginas' and concluidos < total and agora - ultima_gravacao[0] < INTERVALO_PROGRESSO:
+            return
+        ultima_gravacao[0] = agora
+        with _conectar(diretorio) as conexao:
+            if etapa == 'paginas':
+                conexao.execute('UPDATE tarefas SET etapa = ?, paginas = ?, total_paginas = ? WHERE id = ?',
+                                (etapa, concluidos, total, id_tarefa))
+            else:
+                conexao.execute('UPDATE tarefas SET etapa = ? WHERE id = ?', (etapa, id_tarefa))
+            estado = conexao.execute('SELECT estado FROM tarefas WHERE id = ?', (id_tarefa,)).fetchone()[0]
+        if estado == 'cancelada':
+            raise support.ProcessamentoCancelado()
+
+    caminho_pdf = _caminho_pdf(diretorio, tarefa['hash_pdf'])
+    try:
+        resultado = support.main(caminho_pdf, cd=json.loads(tarefa['cd']), progresso=progresso,
+                                 **json.loads(tarefa['opcoes']))
+        caminho = _caminho_resultado(diretorio, id_tarefa)
+        temporario = f'{caminho}.{os.getpid()}.tmp'
+        resultado.to_parquet(temporario)
+        os.replace(temporario, caminho)
+        _finalizar(diretorio, id_tarefa, 'concluida')
+    except support.ProcessamentoCancelado:
+        _finalizar(diretorio, id_tarefa, 'cancelada')
+    except Exception as e:
+        _finalizar(diretorio, id_tarefa, 'erro', f"{type(e).__name__}: {e}")
+    finally:
+        _remover_pdf_sem_uso(diretorio, tarefa['hash_pdf'])
+
+
+def _reservar(diretorio: str, trabalhador: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Marca como em execução a próxima tarefa pendente. A vez é da sessão com
+    menos tarefas em execução e, entre elas, da tarefa mais antiga, para que
+    um envio grande não bloqueie os demais.
+    """
+    with _conectar(diretorio) as conexao:
+        conexao.execute('BEGIN IMMEDIATE')
+        linha = conexao.execute(
+            'SELECT t.* FROM tarefas t WHERE t.estado = ? ORDER BY '
+            '(SELECT COUNT(*) FROM tarefas e WHERE e.estado = ? AND e.sessao IS t.sessao), t.id LIMIT 1',
+            ('pendente', 'executando')
+        ).fetchone()
+        if linha is None:
+            conexao.execute('COMMIT')
+            return None
+        conexao.execute('UPDATE tarefas SET estado = ?, pid = ?, trabalhador = ?, tentativas = tentativas + 1, '
+                        'iniciada_em = ? WHERE id = ?',
+                        ('executando', os.getpid(), trabalhador, time.time(), linha['id']))
+        conexao.execute('COMMIT')
+    return dict(linha)
+
+
+def _finalizar(diretorio: str, id_tarefa: int, estado: str, erro: Optional[str] = None) -> None:
+    with _conectar(diretorio) as conexao:
+        # Uma tarefa cancelada durante a execução continua cancelada
+        conexao.execute(
+            'UPDATE tarefas SET estado = CASE WHEN estado = ? THEN estado ELSE ? END, '
+            'erro = ?, concluida_em = ? WHERE id = ?',
+            ('cancelada', estado, erro, time.time(), id_tarefa)
+        )
+
+
+def _conectar(diretorio: str) -> '_Conexao':
+    """
+    Conexão em modo autocommit (transações explícitas) com o banco da fila,
+    criado na primeira conexão.
+    """
+    caminho = os.path.join(diretorio, NOME_BANCO)
+    with _trava:
+        if caminho not in _bancos_criados:
+            for subdiretorio in ('pdfs', 'resultados'):
+                os.makedirs(os.path.join(diretorio, subdiretorio), exist_ok=True)
+    conexao = sqlite3.connect(caminho, timeout=30, isolation_level=None)
+    conexao.row_factory = sqlite3.Row
+    with _trava:
+        if caminho not in _bancos_criados:
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.executescript(_ESQUEMA)
+            _migrar(conexao)
+            _bancos_criados.add(caminho)
+    return _Conexao(conexao)
+
+
+def _migrar(conexao: sqlite3.Connection) -> None:
+    conexao.execute('BEGIN IMMEDIATE')
+    existentes = {linha['name'] for linha in conexao.execute('PRAGMA table_info(tarefas)')}
+    for coluna, definicao in _COLUNAS_ADICIONADAS:
+        if coluna not in existentes:
+            conexao.execute(f'ALTER TABLE tarefas ADD COLUMN {coluna} {definicao}')
+    conexao.execute('COMMIT')
+
+
+class _Conexao:
+    """
+    Fecha a conexão ao sair do bloco with (o sqlite3 só encerra a transação).
+    """
+
+    def __init__(self, conexao: sqlite3.Connection):
+        self._conexao = conexao
+
+    def __enter__(self) -> sqlite3.Connection:
+        return self._conexao
+
+    def __exit__(self, tipo, *args) -> None:
+        if tipo is not None and self._conexao.in_transaction:
+            self._conexao.execute('ROLLBACK')
+        self._conexao.close()
+
+
+def _caminho_pdf(diretorio: str, hash_pdf: str) -> str:
+    return os.path.join(diretorio, 'pdfs', hash_pdf + '.pdf')
+
+
+def _caminho_resultado(diretorio: str, id_tarefa: int) -> str:
+    return os.path.join(diretorio, 'resultados', f'{id_tarefa}.parquet')
+
+
+def _salvar_pdf(diretorio: str, hash_pdf: str, pdf) -> None:
+    caminho = _caminho_pdf(diretorio, hash_pdf)
+    if os.path.exists(caminho):
+        return
+
+    temporario = f'{caminho}.{os.getpid()}.{threading.get_ident()}.tmp'
+    if isinstance(pdf, bytes):
+        with open(temporario, 'wb') as arquivo:
+            arquivo.write(pdf)
+    else:
+        with open(pdf, 'rb') as origem, open(temporario, 'wb') as arquivo:
+            for bloco in iter(lambda: origem.read(1024 * 1024), b''):
+                arquivo.write(bloco)
+    os.replace(temporario, caminho)
+
+
+def _remover_pdf_sem_uso(diretorio: str, hash_pdf: str) -> None:
+    with _conectar(diretorio) as conexao:
+        conexao.execute('BEGIN IMMEDIATE')
+        em_uso = conexao.execute('SELECT 1 FROM tarefas WHERE hash_pdf = ? AND estado IN (?, ?) LIMIT 1',
+                                 (hash_pdf, *ESTADOS_ATIVOS)).fetchone()
+        if em_uso is None:
+            try:
+                os.remove(_caminho_pdf(diretorio, hash_pdf))
+            except FileNotFoundError:
+                pass
+        conexao.execute('COMMIT')
+
+
+@contextlib.contextmanager
+def _travar(caminho: str):
+    with open(caminho, 'a') as arquivo:
+        fcntl.flock(arquivo, fcntl.LOCK_EX)
+        yield
+
+
+def _obter_trava(caminho: str, espera: float = 0.0) -> Optional[IO]:
+    """
+    Abre o arquivo e pega a trava exclusiva, tentando por até `espera`
+    segundos. Retorna o arquivo aberto (fechá-lo solta a trava) ou None.
+    """
+    arquivo = open(caminho, 'a')
+    limite = time.time() + espera
+    while True:
+        try:
+            fcntl.flock(arquivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return arquivo
+        except BlockingIOError:
+            if time.time() >= limite:
+                arquivo.close()
+                return None
+            time.sleep(0.1)
+
+
+def _trava_presa(caminho: str) -> bool:
+    """
+    Indica se algum processo vivo segura a trava do arquivo.
+    """
+    trava = _obter_trava(caminho)
+    if trava is None:
+        return True
+    trava.close()
+    return False
+
+
+def _caminho_trava_worker(diretorio: str, trabalhador: str) -> str:
+    return os.path.join(diretorio, DIRETORIO_TRAVAS_WORKERS, trabalhador + '.lock')
+
+
+def _worker_vivo(diretorio: str, trabalhador: Optional[str]) -> bool:
+    if not trabalhador:
+        return False
+    caminho = _caminho_trava_worker(diretorio, trabalhador)
+    if not os.path.exists(caminho):
+        return False
+    if _trava_presa(caminho):
+        return True
+    # Worker morto: a trava dele não serve mais
+    try:
+        os.remove(caminho)
+    except FileNotFoundError:
+        pass
+    return False
+
+
+def _ler_pid_servico(diretorio: str) -> Optional[int]:
+    try:
+        with open(os.path.join(diretorio, NOME_PID_SERVICO)) as arquivo:
+            return int(arquivo.read().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serviço local que executa as tarefas da fila de PDFs.")
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1,
+                        help="Quantidade fixa de processos executando tarefas")
+    parser.add_argument('-d', '--diretorio', help="Diretório do banco e dos arquivos da fila")
+    parser.add_argument('--reter-dias', type=float, default=IDADE_MAXIMA_FINALIZADAS / (24 * 60 * 60),
+                        help="Dias que as tarefas finalizadas e os resultados ficam na fila")
+    args = parser.parse_args()
+
+    # SIGTERM também para os workers de forma ordenada
+    signal.signal(signal.SIGTERM, lambda *_: signal.raise_signal(signal.SIGINT))
+    try:
+        servico = ServicoFila(args.workers, args.diretorio, args.reter_dias * 24 * 60 * 60).iniciar()
+    except RuntimeError as e:
+        print(e, flush=True)
+        sys.exit(0)
+    print(f"Fila em execução com {args.workers} worker(s). Ctrl+C para parar.", flush=True)
+    try:
+        servico.aguardar()
+    except KeyboardInterrupt:
+        servico.parar()
+    sys.exit(0)
@@ -0,0 +1,264 @@
+import ctypes
+import os
+import pdfplumber
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+from io import BytesIO
+from pdfplumber.utils import extract_text, extract_words
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+
+# Backends de leitura do PDF:
+# 'pdfplumber' usa o pdfminer (Python puro) para todo o layout;
+# 'pdfium' lê o texto posicionado direto da biblioteca nativa.
+BACKENDS_PDF = ('pdfplumber', 'pdfium')
+
+# Entradas aceitas para o PDF: caminho, conteúdo em memória ou buffer binário
+EntradaPdf = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO]
+
+# Matriz de transformação (a, b, c, d, e, f) do PDF
+Matriz = Tuple[float, float, float, float, float, float]
+MATRIZ_IDENTIDADE: Matriz = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+
+def normalizar_entrada_pdf(pdf: EntradaPdf) -> Union[str, os.PathLike, bytes]:
+    """
+    Caminhos ficam como estão; bytearray, memoryview e buffers (inclusive o
+    upload do Streamlit) viram bytes, que podem ser reabertos quantas vezes
+    for preciso e enviados aos processos de extração.
+    """
+    if isinstance(pdf, (str, os.PathLike, bytes)):
+        return pdf
+    if isinstance(pdf, (bytearray, memoryview)):
+        return bytes(pdf)
+    if hasattr(pdf, 'getvalue'):
+        return pdf.getvalue()
+    if hasattr(pdf, 'read'):
+        if hasattr(pdf, 'seek'):
+            pdf.seek(0)
+        return pdf.read()
+    raise TypeError(f"Entrada de PDF não suportada: {type(pdf).__name__}")
+
+
+def abrir_pdf(caminho_pdf: EntradaPdf, backend: str = 'pdfplumber'):
+    """
+    Abre o PDF com o backend escolhido. O objeto retornado expõe `pages`
+    com a mesma interface de página usada pela extração.
+    """
+    caminho_pdf = normalizar_entrada_pdf(caminho_pdf)
+    if backend == 'pdfplumber':
+        if isinstance(caminho_pdf, bytes):
+            return pdfplumber.open(BytesIO(caminho_pdf))
+        return pdfplumber.open(caminho_pdf)
+    if backend == 'pdfium':
+        return DocumentoPdfium(caminho_pdf)
+    raise ValueError(f"Backend de PDF inválido: {backend}")
+
+
+class DocumentoPdfium:
+    """
+    Documento aberto com o pypdfium2.
+    """
+
+    def __init__(self, caminho_pdf):
+        self.caminho_pdf = caminho_pdf
+        self._documento = pdfium.PdfDocument(caminho_pdf)
+        self._documento_pdfplumber = None
+        self._edges = {}
+        self.pages = [PaginaPdfium(self, numero) for numero in range(len(self._documento))]
+
+    def pagina_pdfplumber(self, numero: int):
+        """
+        Página equivalente no pdfplumber, aberta apenas quando necessária.
+        """
+        if self._documento_pdfplumber is None:
+            self._documento_pdfplumber = abrir_pdf(self.caminho_pdf, 'pdfplumber')
+        return self._documento_pdfplumber.pages[numero]
+
+    def edges_pagina(self, numero: int) -> List[Dict]:
+        """
+        Segmentos retos horizontais e verticais dos caminhos da página
+        (inclusive dentro de XObjects de formulário), no formato de
+        pdfplumber.edges.
+        """
+        if numero not in self._edges:
+            pagina = self._documento[numero]
+            altura = pagina.get_height()
+            edges = []
+            objetos = [pdfium_c.FPDFPage_GetObject(pagina.raw, i)
+                       for i in range(pdfium_c.FPDFPage_CountObjects(pagina.raw))]
+            _coletar_edges(objetos, MATRIZ_IDENTIDADE, altura, edges)
+            pagina.close()
+            self._edges[numero] = edges
+        return self._edges[numero]
+
+    def close(self) -> None:
+        if self._documento_pdfplumber is not None:
+            self._documento_pdfplumber.close()
+            self._documento_pdfplumber = None
+        self._documento.close()
+
+    def __enter__(self) -> 'DocumentoPdfium':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class PaginaPdfium:
+    """
+    Página do pdfium com a interface de texto do pdfplumber
+    (extract_text, extract_words e extract_tables) e as linhas retas
+    da página (edges).
+    """
+
+    def __init__(self, documento: DocumentoPdfium, numero: int):
+        self.documento = documento
+        self.numero = numero
+        self.page_number = numero + 1
+        largura, altura = documento._documento.get_page_size(numero)
+        self.bbox = (0, 0, largura, altura)
+        self._chars = None
+        self._edges = None
+
+    @property
+    def chars(self) -> List[Dict]:
+        if self._chars is None:
+            self._chars = self._ler_chars()
+        return self._chars
+
+    def _ler_chars(self) -> List[Dict]:
+        pagina = self.documento._documento[self.numero]
+        texto = pagina.get_textpage()
+        altura = pagina.get_height()
+
+        chars = []
+        for i in range(texto.count_chars()):
+            # Ignora espaços e quebras de linha gerados pelo próprio pdfium
+            if pdfium_c.FPDFText_IsGenerated(texto.raw, i):
+                continue
+            esquerda, base, direita, topo = texto.get_charbox(i, loose=True)
+            chars.append({
+                'text': chr(pdfium_c.FPDFText_GetUnicode(texto.raw, i)),
+                'x0': esquerda,
+                'x1': direita,
+                'top': altura - topo,
+                'bottom': altura - base,
+                'doctop': altura - topo,
+                'upright': True,
+            })
+
+        texto.close()
+        pagina.close()
+        return chars
+
+    @property
+    def edges(self) -> List[Dict]:
+        if self._edges is None:
+            x0, topo, x1, fundo = self.bbox
+            self._edges = [
+                e for e in self.documento.edges_pagina(self.numero)
+                if e['x0'] <= x1 and e['x1'] >= x0 and e['top'] <= fundo and e['bottom'] >= topo
+            ]
+        return self._edges
+
+    def extract_text(self, **kwargs) -> str:
+        return extract_text(self.chars, **kwargs)
+
+    def extract_words(self, **kwargs) -> List[Dict]:
+        return extract_words(self.chars, **kwargs)
+
+    def crop(self, bbox: Tuple[float, float, float, float]) -> 'PaginaPdfium':
+        """
+        Recorte da página mantendo apenas os caracteres que tocam o bbox.
+        """
+        x0, topo, x1, fundo = bbox
+        recorte = PaginaPdfium.__new__(PaginaPdfium)
+        recorte.documento = self.documento
+        recorte.numero = self.numero
+        recorte.page_number = self.page_number
+        recorte.bbox = bbox
+        recorte._edges = None
+        recorte._chars = [
+            c for c in self.chars
+            if c['x0'] < x1 and c['x1'] > x0 and c['top'] < fundo and c['bottom'] > topo
+        ]
+        return recorte
+
+    def close(self) -> None:
+        """
+        Libera os caracteres lidos e o layout da página equivalente no pdfplumber.
+        """
+        self._chars = None
+        self._edges = None
+        self.documento._edges.pop(self.numero, None)
+        if self.documento._documento_pdfplumber is not None:
+            self.documento._documento_pdfplumber.pages[self.numero].close()
+
+    # O pdfium não detecta tabelas; recorre ao pdfplumber
+    def find_tables(self, table_settings: Optional[Dict] = None) -> List:
+        return self.documento.pagina_pdfplumber(self.numero).find_tables(table_settings)
+
+    def extract_tables(self, table_settings: Optional[Dict] = None) -> List[List]:
+        return self.documento.pagina_pdfplumber(self.numero).extract_tables(table_settings)
+
+
+def _compor(m: Matriz, n: Matriz) -> Matriz:
+    """
+    Matriz equivalente a aplicar m e depois n.
+    """
+    a, b, c, d, e, f = m
+    a2, b2, c2, d2, e2, f2 = n
+    return (a * a2 + b * c2, a * b2 + b * d2, c * a2 + d * c2, c * b2 + d * d2,
+            e * a2 + f * c2 + e2, e * b2 + f * d2 + f2)
+
+
+def _coletar_edges(objetos: List, matriz_pai: Matriz, altura: float, edges: List[Dict]) -> None:
+    ponto_x, ponto_y = ctypes.c_float(), ctypes.c_float()
+    for objeto in objetos:
+        matriz = pdfium_c.FS_MATRIX()
+        pdfium_c.FPDFPageObj_GetMatrix(objeto, matriz)
+        matriz = _compor((matriz.a, matriz.b, matriz.c, matriz.d, matriz.e, matriz.f), matriz_pai)
+        tipo = pdfium_c.FPDFPageObj_GetType(objeto)
+
+        if tipo == pdfium_c.FPDF_PAGEOBJ_FORM:
+            _coletar_edges([pdfium_c.FPDFFormObj_GetObject(objeto, i)
+                            for i in range(pdfium_c.FPDFFormObj_CountObjects(objeto))], matriz, altura, edges)
+            continue
+        if tipo != pdfium_c.FPDF_PAGEOBJ_PATH:
+            continue
+
+        a, b, c, d, e, f = matriz
+        inicio = anterior = None
+        for i in range(pdfium_c.FPDFPath_CountSegments(objeto)):
+            segmento = pdfium_c.FPDFPath_GetPathSegment(objeto, i)
+            pdfium_c.FPDFPathSegment_GetPoint(segmento, ponto_x, ponto_y)
+            x, y = ponto_x.value, ponto_y.value
+            ponto = (a * x + c * y + e, b * x + d * y + f)
+            if pdfium_c.FPDFPathSegment_GetType(segmento) == pdfium_c.FPDF_SEGMENT_LINETO and anterior is not None:
+                _adicionar_edge(anterior, ponto, altura, edges)
+            elif pdfium_c.FPDFPathSegment_GetType(segmento) == pdfium_c.FPDF_SEGMENT_MOVETO:
+                inicio = ponto
+            anterior = ponto
+            if pdfium_c.FPDFPathSegment_GetClose(segmento) and inicio is not None:
+                _adicionar_edge(ponto, inicio, altura, edges)
+                anterior = inicio
+
+
+def _adicionar_edge(p1: Tuple[float, float], p2: Tuple[float, float], altura: float, edges: List[Dict]) -> None:
+    """
+    Guarda o segmento se for horizontal ou vertical (o que forma as grades
+    das tabelas), com o topo medido a partir do alto da página.
+    """
+    (x1, y1), (x2, y2) = p1, p2
+    if abs(x1 - x2) < 0.5:
+        orientacao = 'v'
+    elif abs(y1 - y2) < 0.5:
+        orientacao = 'h'
+    else:
+        return
+    edges.append({
+        'x0': min(x1, x2), 'x1': max(x1, x2),
+        'top': altura - max(y1, y2), 'bottom': altura - min(y1, y2),
+        'orientation': orientacao,
+    })
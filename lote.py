@@ -0,0 +1,187 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+import exportacao
+import support
+
+
+def listar_pdfs(entradas: List[str], recursivo: bool = False) -> List[str]:
+    """
+    Expande diretórios (os PDFs dentro deles) e padrões glob numa lista
+    ordenada de arquivos, sem repetições.
+    """
+    arquivos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            padrao = os.path.join(entrada, '**', '*') if recursivo else os.path.join(entrada, '*')
+            arquivos.extend(arquivo for arquivo in glob.glob(padrao, recursive=recursivo)
+                            if arquivo.lower().endswith('.pdf') and os.path.isfile(arquivo))
+        elif glob.has_magic(entrada):
+            arquivos.extend(glob.glob(entrada, recursive=recursivo))
+        else:
+            arquivos.append(entrada)
+    return sorted(set(os.path.abspath(arquivo) for arquivo in arquivos))
+
+
+def nomes_relativos(arquivos: List[str]) -> List[str]:
+    """
+    Caminho de cada PDF relativo ao diretório comum a todos, para que PDFs
+    de mesmo nome em subdiretórios diferentes (jan/cd59.pdf e fev/cd59.pdf)
+    continuem distintos na saída.
+    """
+    if not arquivos:
+        return []
+    raiz = os.path.commonpath([os.path.dirname(arquivo) for arquivo in arquivos])
+    return [os.path.relpath(arquivo, raiz) for arquivo in arquivos]
+
+
+def caminho_saida(diretorio_saida: str, nome_relativo: str, formato: str) -> str:
+    return os.path.join(diretorio_saida, os.path.splitext(nome_relativo)[0] + '.' + formato)
+
+
+def processar_arquivo(caminho_pdf: str, diretorio_saida: Optional[str], formato: str, opcoes: Dict,
+                      retornar_resultado: bool = False, nome_relativo: Optional[str] = None) -> Dict:
+    """
+    Processa um PDF com support.main e grava a saída correspondente, no
+    mesmo caminho relativo (nome_relativo) dentro de diretorio_saida. Nunca
+    levanta exceção: falhas ficam registradas no resumo do arquivo.
+    """
+    resumo = {'entrada': caminho_pdf, 'saida': None, 'linhas': 0, 'segundos': 0.0, 'erro': None}
+    inicio = time.perf_counter()
+    try:
+        resultado = support.main(caminho_pdf, **opcoes)
+        resumo['linhas'] = len(resultado)
+        if diretorio_saida is not None:
+            resumo['saida'] = caminho_saida(diretorio_saida, nome_relativo or os.path.basename(caminho_pdf), formato)
+            os.makedirs(os.path.dirname(resumo['saida']), exist_ok=True)
+            exportacao.exportar_arquivo(resultado, resumo['saida'], formato)
+        if retornar_resultado:
+            resumo['resultado'] = resultado
+    except Exception as e:
+        resumo['erro'] = f"{type(e).__name__}: {e}"
+    resumo['segundos'] = round(time.perf_counter() - inicio, 3)
+    return resumo
+
+
+def processar_diretorio(arquivos: List[str], diretorio_saida: Optional[str], formato: str = 'xlsx',
+                        num_workers: int = 1, consolidado: Optional[str] = None, **opcoes) -> Dict:
+    """
+    Processa os PDFs num pool de processos (um PDF por tarefa) e retorna o
+    resumo em dicionário, pronto para JSON. Com consolidado, grava também
+    um arquivo único com todos os resultados e a coluna ARQUIVO (o caminho
+    relativo do PDF). Levanta ValueError se dois PDFs tiverem a mesma saída.
+    Se a planilha de horários não puder ser carregada, nenhum PDF é
+    processado e o motivo fica em resumo['erro'].
+    """
+    nomes = nomes_relativos(arquivos)
+    if diretorio_saida is not None:
+        saidas: Dict[str, str] = {}
+        for arquivo, nome in zip(arquivos, nomes):
+            saida = os.path.normcase(caminho_saida(diretorio_saida, nome, formato))
+            if saida in saidas:
+                raise ValueError(f"{saidas[saida]} e {arquivo} teriam a mesma saída: {saida}")
+            saidas[saida] = arquivo
+        os.makedirs(diretorio_saida, exist_ok=True)
+
+    # Baixa a planilha de horários uma vez; os processos usam o snapshot em disco
+    inicio = time.perf_counter()
+    if opcoes.get('horarios_csv') is None:
+        try:
+            support.import_horarios(offline=opcoes.get('horarios_offline', False))
+        except Exception as e:
+            return {'arquivos': [], 'consolidado': None, 'erro': f"Horários indisponíveis: {type(e).__name__}: {e}",
+                    'total': len(arquivos), 'falhas': len(arquivos),
+                    'segundos': round(time.perf_counter() - inicio, 3)}
+        opcoes['horarios_offline'] = True
+
+    argumentos = [(arquivo, diretorio_saida, formato, opcoes, consolidado is not None, nome)
+                  for arquivo, nome in zip(arquivos, nomes)]
+    if num_workers > 1 and len(arquivos) > 1:
+        with ProcessPoolExecutor(max_workers=min(num_workers, len(arquivos)),
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            resumos = list(executor.map(processar_arquivo, *zip(*argumentos)))
+    else:
+        resumos = [processar_arquivo(*args) for args in argumentos]
+
+    resumo = {'arquivos': resumos, 'consolidado': None, 'erro': None}
+    resultados = [r.pop('resultado').assign(ARQUIVO=nome)
+                  for r, nome in zip(resumos, nomes) if 'resultado' in r]
+    if consolidado is not None and resultados:
+        tabela = pd.concat(resultados, ignore_index=True)
+        exportacao.exportar_arquivo(tabela, consolidado)
+        resumo['consolidado'] = consolidado
+
+    resumo['total'] = len(resumos)
+    resumo['falhas'] = sum(1 for r in resumos if r['erro'] is not None)
+    resumo['segundos'] = round(time.perf_counter() - inicio, 3)
+    return resumo
+
+
+def criar_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Processa espelhos de ponto em lote, sem a interface do Streamlit."
+    )
+    parser.add_argument('entradas', nargs='+', help="PDFs, diretórios ou padrões glob (ex.: 'arquivo/*.pdf')")
+    parser.add_argument('-s', '--saida', help="Diretório para a saída de cada PDF")
+    parser.add_argument('-f', '--formato', choices=list(exportacao.FORMATOS_EXPORTACAO), default='xlsx',
+                        help="Formato da saída de cada PDF (padrão: xlsx)")
+    parser.add_argument('-c', '--consolidado', help="Arquivo único com todos os resultados (.xlsx, .parquet ou .csv)")
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1,
+                        help="Processos usados em paralelo, um PDF por processo")
+    parser.add_argument('-r', '--recursivo', action='store_true', help="Procura PDFs nos subdiretórios")
+    parser.add_argument('--horarios-csv', help="CSV local com os horários, no lugar da planilha")
+    parser.add_argument('--horarios-offline', action='store_true',
+                        help="Usa o último snapshot da planilha de horários, sem acessar a rede")
+    parser.add_argument('--cd', help="CD dos PDFs (entra na chave do cache de resultados)")
+    parser.add_argument('--motor', choices=list(support.MOTORES_EXTRACAO), default='tabelas')
+    parser.add_argument('--backend', choices=list(support.BACKENDS_PDF), default='pdfplumber')
+    parser.add_argument('--cache', action='store_true', help="Reaproveita e grava o cache de resultados")
+    parser.add_argument('--resumo', help="Grava o resumo JSON neste arquivo em vez da saída padrão")
+    return parser
+
+
+def executar(argv: Optional[List[str]] = None) -> int:
+    """
+    Ponto de entrada da linha de comando. Retorna 0 sem falhas, 1 se algum
+    PDF falhou e 2 se nenhum PDF foi encontrado, se dois PDFs teriam a
+    mesma saída ou se a planilha de horários não pôde ser carregada.
+    """
+    args = criar_parser().parse_args(argv)
+    arquivos = listar_pdfs(args.entradas, args.recursivo)
+    if not arquivos:
+        print("Nenhum PDF encontrado.", file=sys.stderr)
+        return 2
+
+    try:
+        resumo = processar_diretorio(
+            arquivos, args.saida, formato=args.formato, num_workers=args.workers, consolidado=args.consolidado,
+            horarios_csv=args.horarios_csv, horarios_offline=args.horarios_offline, cd=args.cd,
+            motor=args.motor, backend=args.backend, usar_cache=args.cache,
+        )
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    texto = json.dumps(resumo, ensure_ascii=False, indent=2)
+    if args.resumo:
+        with open(args.resumo, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto)
+    else:
+        print(texto)
+    if resumo['erro'] is not None:
+        print(resumo['erro'], file=sys.stderr)
+        return 2
+    return 1 if resumo['falhas'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(executar())
@@ -1,17 +1,116 @@
 import pandas as pd
-import pdfplumber
+import numpy as np
 from typing import List, Dict, Optional
+import hashlib
+import multiprocessing
 import re
-from typing import List, Tuple, Optional, Dict, Any
+from typing import List, Tuple, Optional, Dict, Any, Callable, Iterator, Mapping, NamedTuple, Union
 from datetime import datetime, timedelta, time
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from pdfplumber.utils import cluster_objects
 import nomes_colaboradores
+import cache_horarios
+import cache_resultados
+import exportacao
+from leitores_pdf import BACKENDS_PDF, EntradaPdf, abrir_pdf, normalizar_entrada_pdf
 
 
-def import_horarios(uiid: str = '1Xo19_dftUc3GsTK-R6mKz8EAiLgGouBwKcxsu9ioJVc', gid: str = '806690514') -> pd.DataFrame:
-    horarios = pd.read_csv(
-        f'https://docs.google.com/spreadsheets/d/{uiid}/export?gid={gid}&format=csv'
-    )
+# Planilha (Google Sheets) e aba com os horários programados
+UIID_HORARIOS = '1Xo19_dftUc3GsTK-R6mKz8EAiLgGouBwKcxsu9ioJVc'
+GID_HORARIOS = '806690514'
+
+# Motores de extração das tabelas de ponto:
+# 'tabelas' usa o extract_tables genérico do pdfplumber;
+# 'coordenadas' usa o layout fixo do espelho e agrupa as palavras por posição.
+MOTORES_EXTRACAO = ('tabelas', 'coordenadas')
+
+# Versão do formato retornado por extrair_pagina; entra na chave do cache de
+# páginas e deve mudar sempre que a extração passar a produzir outro resultado
+VERSAO_EXTRACAO = 2
+
+# Versão do pipeline (partes 1 e 2); entra na chave do cache de resultados e
+# deve mudar sempre que o código passar a produzir outra saída
+VERSAO_PIPELINE = 1
+
+# Colunas retornadas por main
+COLUNAS_SAIDA = ['Dia','3a E.', '3a S.', 'Abono','Observação', '1a E.', '1a S.', '2a E.', '2a S.',
+                 'Data', 'COLABORADOR', 'AUSENCIA', 'ENTRADA',
+                 'SAIDA INTERVALO', 'VOLTA INTERVALO', 'SAIDA', 'ALERTA']
+
+# Colunas retornadas por exec_parte1
+COLUNAS_PARTE1 = ['Dia', '1a E.', '1a S.', '2a E.', '2a S.', '3a E.', '3a S.', 'Abono', 'Observação', 'Data',
+                  'COLABORADOR', 'AUSENCIA', 'ENTRADA', 'SAIDA INTERVALO', 'VOLTA INTERVALO', 'SAIDA', 'ALERTA']
+
+# Colunas de marcações do espelho e colunas preenchidas pela transformação
+COLUNAS_HORARIO = ('1a E.', '1a S.', '2a E.', '2a S.', '3a E.', '3a S.')
+COLUNAS_MARCACAO = ('AUSENCIA', 'ENTRADA', 'SAIDA INTERVALO', 'VOLTA INTERVALO', 'SAIDA', 'ALERTA')
+
+# Esquema compacto (opcional) do resultado: colunas de vocabulário pequeno
+# (inclusive o texto das marcações) viram categorias e cada marcação ganha
+# uma coluna de minutos
+COLUNAS_CATEGORICAS = ['Dia', 'COLABORADOR', 'Abono', 'Observação', 'CD'] + list(COLUNAS_HORARIO) + list(COLUNAS_MARCACAO)
+SUFIXO_MINUTOS = ' MIN'
+
+# Valores que indicam mesclagem horizontal de células no espelho
+PADRAO_MESCLADO = re.compile(r'\*\*|AUSENTE|D\.S\.R|PERIODO|BANCO|FERIADO|HORARIO JUSTIFICADO|DESCONTO EM FOLHA')
+_BLOQUEIO_MESCLAGEM = object()
+
+PADRAO_DATA = re.compile(r'\d{2}/\d{2}/\d{4}')
+
+# Horários aceitos nas batidas: HH:MM[:SS], HH.MM ou HH,MM (mesmos limites do strptime)
+PADRAO_HORARIO = re.compile(
+    r'(2[0-3]|[01]\d|\d)'
+    r'(?::([0-5]\d|\d)(?::([0-5]\d|\d))?|[.,]([0-5]\d|\d))'
+)
+SEGUNDOS_DIA = 24 * 60 * 60
+
+# Dias da semana como aparecem no espelho; a posição é o bit na máscara de dias
+DIAS_SEMANA = ('Segunda', 'Terca', 'Quarta', 'Quinta', 'Sexta', 'Sabado', 'Domingo')
+BIT_DIA = {dia: 1 << i for i, dia in enumerate(DIAS_SEMANA)}
+
+# Tipos de situação de uma célula de horário (categorias da coluna SITUACAO)
+TIPOS_SITUACAO = ['vazio', 'ausente', 'isento', 'ferias', 'dsr', 'registro_positron', 'horario']
+
+# Campos do cabeçalho do espelho. Cada alternativa é um lookahead, então a
+# varredura única encontra a primeira ocorrência de cada campo, como buscas
+# independentes fariam, sem que um campo consuma o texto do outro.
+PADRAO_CABECALHO = re.compile(
+    r'(?=Matrícula:\s*(?P<matricula>\d+\s*-\s*\d+))'
+    r'|(?=Função:\s*\d+\s*-\s*(?P<funcao>.+))'
+    r'|(?=Nome:\s*(?P<nome>[A-Z\s]+))'
+    r'|(?=CPF:\s*(?P<cpf>[\d\.\-]+))'
+    r'|(?=(?P<periodo_inicio>\d{2}/\d{2}/\d{4})\s*-\s*(?P<periodo_fim>\d{2}/\d{2}/\d{4}))'
+)
+
+# Callback de progresso: progresso(etapa, concluidos, total). A etapa é
+# 'paginas' durante a extração, 'funcionarios' após a consolidação e o nome
+# de cada etapa do pipeline (com o total de funcionários) ao concluí-la.
+Progresso = Callable[[str, int, int], None]
+INTERVALOS_POR_WORKER_PROGRESSO = 4
+
+
+class ProcessamentoCancelado(Exception):
+    """
+    Levantada pelo callback de progresso para interromper o processamento.
+    """
+
+
+def import_horarios(uiid: str = UIID_HORARIOS, gid: str = GID_HORARIOS,
+                    ttl: float = cache_horarios.TTL_PADRAO, offline: bool = False, caminho_csv=None) -> pd.DataFrame:
+    """
+    Importa a planilha de horários com cache em memória e snapshot em disco
+    (ver cache_horarios). caminho_csv usa um CSV local no lugar da planilha
+    e offline usa o último snapshot sem acessar a rede.
+    """
+    return cache_horarios.carregar_horarios(uiid, gid, tratar_horarios, ttl=ttl, offline=offline,
+                                            caminho_csv=caminho_csv)
+
 
+def tratar_horarios(horarios: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aplica as tolerâncias e expande os períodos da planilha de horários.
+    """
     def tolerancia(horario_str: str, minutos: int, subtract= False) -> Optional[time]:
         try:
             dt = datetime.strptime(horario_str, '%H:%M')
@@ -44,157 +143,558 @@ def import_horarios(uiid: str = '1Xo19_dftUc3GsTK-R6mKz8EAiLgGouBwKcxsu9ioJVc',
 
     return horarios
 
-def converter_para_time(horario_str: Any, tolerancia: str = 5) -> Optional[time]:
-    if pd.isna(horario_str) or horario_str == '' or horario_str is None:
+
+def import_indice_horarios(uiid: str = UIID_HORARIOS, gid: str = GID_HORARIOS,
+                           ttl: float = cache_horarios.TTL_PADRAO, offline: bool = False,
+                           caminho_csv=None) -> 'IndiceHorarios':
+    """
+    Importa a planilha de horários já compilada no índice usado por exec_parte2.
+    """
+    return compilar_indice_horarios(import_horarios(uiid, gid, ttl=ttl, offline=offline, caminho_csv=caminho_csv))
+
+
+class HorarioProgramado(NamedTuple):
+    """
+    Horário de um colaborador: máscara de dias e entrada/saída em minutos
+    (com tolerância, na mesma escala das marcações convertidas) de cada turno.
+    """
+    mascara: int
+    entrada: Optional[int]
+    saida: Optional[int]
+    mascara_2: int
+    entrada_2: Optional[int]
+    saida_2: Optional[int]
+    sab2t: Any
+
+
+class IndiceHorarios(Mapping):
+    """
+    Índice imutável colaborador -> HorarioProgramado.
+    """
+
+    def __init__(self, horarios: Dict[str, HorarioProgramado]):
+        self._horarios = dict(horarios)
+
+    def __getitem__(self, colaborador: str) -> HorarioProgramado:
+        return self._horarios[colaborador]
+
+    def __iter__(self):
+        return iter(self._horarios)
+
+    def __len__(self) -> int:
+        return len(self._horarios)
+
+    def buscar(self, colaborador: str, dia_semana: str) -> Tuple[Optional[int], Optional[int], Any]:
+        """
+        Entrada e saída programadas (em minutos) e SAB.2T do colaborador no dia.
+        """
+        horario = self._horarios.get(colaborador)
+        if horario is None:
+            return None, None, None
+
+        # Sábado usa o segundo turno (ENTRADA.1, SAIDA.1)
+        bit = BIT_DIA.get(dia_semana, 0)
+        if bit & horario.mascara_2:
+            return horario.entrada_2, horario.saida_2, horario.sab2t
+        if bit & horario.mascara:
+            return horario.entrada, horario.saida, horario.sab2t
+        return None, None, None
+
+
+def mascara_dias(periodo: Any) -> int:
+    """
+    Converte 'Segunda, Terca, ...' na máscara de bits dos dias.
+    """
+    mascara = 0
+    for dia in str(periodo).split(','):
+        mascara |= BIT_DIA.get(dia.strip(), 0)
+    return mascara
+
+
+def compilar_indice_horarios(horarios: pd.DataFrame) -> IndiceHorarios:
+    """
+    Compila a tabela de horários (já tratada por import_horarios) num índice
+    por colaborador. Vale a primeira linha de cada colaborador.
+    """
+    horarios = horarios.drop_duplicates('COLABORADORES', keep='first')
+
+    def minutos(coluna: str) -> List[Optional[int]]:
+        convertidos = converter_coluna_para_minutos(horarios[coluna].astype(object))
+        return [None if pd.isna(m) else int(m) for m in convertidos]
+
+    entradas, saidas = minutos('ENTRADA'), minutos('SAIDA')
+    entradas_2, saidas_2 = minutos('ENTRADA.1'), minutos('SAIDA.1')
+
+    indice = {}
+    for i, colaborador in enumerate(horarios['COLABORADORES']):
+        indice[colaborador] = HorarioProgramado(
+            mascara=mascara_dias(horarios['PERIODO'].iloc[i]),
+            entrada=entradas[i],
+            saida=saidas[i],
+            mascara_2=mascara_dias(horarios['PERIODO.1'].iloc[i]),
+            entrada_2=entradas_2[i],
+            saida_2=saidas_2[i],
+            sab2t=horarios['SAB.2T'].iloc[i],
+        )
+    return IndiceHorarios(indice)
+
+def converter_para_time(horario_str: Any, tolerancia: int = 5) -> Optional[time]:
+    """
+    Converte um horário do espelho em datetime.time somando a tolerância
+    (em minutos). Retorna None quando o valor não é um horário.
+    """
+    segundos = segundos_do_horario(horario_str, tolerancia)
+    if segundos is None:
         return None
-    
-    horario_str = str(horario_str).strip()
-    
-    if horario_str == '' or horario_str.lower() == 'nan':
+    return time(segundos // 3600, segundos // 60 % 60, segundos % 60)
+
+
+def horario_em_minutos(horario_str: Any, tolerancia: int = 5) -> Optional[int]:
+    """
+    Minutos desde a meia-noite do horário com a tolerância somada (os
+    segundos são descartados), ou None quando o valor não é um horário.
+    """
+    segundos = segundos_do_horario(horario_str, tolerancia)
+    return None if segundos is None else segundos // 60
+
+
+def segundos_do_horario(horario_str: Any, tolerancia: int = 5) -> Optional[int]:
+    """
+    Segundos desde a meia-noite do horário com a tolerância somada, dando a
+    volta à meia-noite como o datetime.time. Aceita HH:MM[:SS], HH.MM e HH,MM.
+    """
+    if isinstance(horario_str, str):
+        segundos = _ler_horario(horario_str.strip())
+    elif horario_str is None or pd.isna(horario_str):
         return None
-    
-    # Verifica palavras que indicam ausência/licença
-    palavras_invalidas = ['ausente', 'falta', 'licença', 'férias', 'atestado', 'folga', 'dsr']
-    if any(palavra in horario_str.lower() for palavra in palavras_invalidas):
+    else:
+        segundos = _ler_horario(str(horario_str).strip())
+
+    if segundos is None:
         return None
-    
+    return (segundos + tolerancia * 60) % SEGUNDOS_DIA
+
+
+@lru_cache(maxsize=4096)
+def _ler_horario(texto: str) -> Optional[int]:
+    correspondencia = PADRAO_HORARIO.fullmatch(texto)
+    if correspondencia is None:
+        return None
+
+    horas, minutos, segundos, minutos_ponto = correspondencia.groups()
+    return int(horas) * 3600 + int(minutos or minutos_ponto) * 60 + int(segundos or 0)
+
+
+def extrair_tabelas_espelho_ponto(caminho_pdf: EntradaPdf, num_workers: int = 1, motor: str = 'tabelas',
+                                  backend: str = 'pdfplumber', ignorar_motoristas: bool = False,
+                                  incremental: bool = False, progresso: Optional[Progresso] = None
+                                  ) -> List[pd.DataFrame]:
+    """
+    Extrai tabelas de espelho de ponto de PDF, tratando casos onde
+    as tabelas se estendem por múltiplas páginas.
+
+    Com num_workers > 1 as páginas são divididas em intervalos contíguos
+    e extraídas em processos separados; o resultado é idêntico ao sequencial.
+    O motor ('tabelas' ou 'coordenadas') define como as linhas são lidas e o
+    backend ('pdfplumber' ou 'pdfium') qual biblioteca lê o PDF. Com
+    ignorar_motoristas, páginas de MOTORISTA são descartadas antes da extração.
+    Com incremental, só as páginas cuja impressão digital não está no cache
+    de páginas (cache_resultados) são extraídas. O PDF pode ser um caminho,
+    bytes, memoryview ou buffer binário; nada é gravado em disco. O callback
+    progresso recebe as páginas concluídas e o total de páginas.
+    """
+    motor = _validar_motor_backend(motor, backend)
+    caminho_pdf = normalizar_entrada_pdf(caminho_pdf)
+
+    if incremental:
+        paginas_extraidas = _extrair_paginas_incremental(caminho_pdf, num_workers, motor, backend,
+                                                         ignorar_motoristas, progresso)
+    elif num_workers > 1:
+        total_paginas = _contar_paginas(caminho_pdf, backend)
+        tamanho = max(1, -(-total_paginas // _num_intervalos(num_workers, progresso)))
+        intervalos = [(caminho_pdf, inicio, min(inicio + tamanho, total_paginas), motor, backend,
+                       ignorar_motoristas)
+                      for inicio in range(0, total_paginas, tamanho)]
+        paginas_extraidas = _extrair_em_paralelo(intervalos, num_workers, progresso, total_paginas)
+    else:
+        total_paginas = _contar_paginas(caminho_pdf, backend) if progresso is not None else None
+        paginas_extraidas = []
+        for resultado in _iterar_paginas(caminho_pdf, 0, None, motor, backend, ignorar_motoristas):
+            paginas_extraidas.append(resultado)
+            _notificar(progresso, 'paginas', len(paginas_extraidas), total_paginas)
+
+    tabelas = consolidar_paginas_extraidas(paginas_extraidas)
+    _notificar(progresso, 'funcionarios', len(tabelas), len(tabelas))
+    return tabelas
+
+def _contar_paginas(caminho_pdf: EntradaPdf, backend: str) -> int:
+    with abrir_pdf(caminho_pdf, backend) as pdf:
+        return len(pdf.pages)
+
+def _num_intervalos(num_workers: int, progresso: Optional[Progresso]) -> int:
+    # Com progresso, intervalos menores dão atualizações mais frequentes
+    return num_workers * (INTERVALOS_POR_WORKER_PROGRESSO if progresso is not None else 1)
+
+def _notificar(progresso: Optional[Progresso], etapa: str, concluidos: int, total: Optional[int]) -> None:
+    if progresso is not None:
+        progresso(etapa, concluidos, total if total is not None else concluidos)
+
+def _extrair_paginas_incremental(caminho_pdf: EntradaPdf, num_workers: int, motor: str, backend: str,
+                                 ignorar_motoristas: bool, progresso: Optional[Progresso] = None
+                                 ) -> List[Tuple[Optional[Dict], List[pd.DataFrame]]]:
+    """
+    Reaproveita a extração das páginas já vistas (pela impressão digital do
+    conteúdo) e extrai apenas as páginas novas ou alteradas.
+    """
+    impressoes = cache_resultados.impressoes_paginas(caminho_pdf)
+    variante = f'{VERSAO_EXTRACAO}/{motor}/{backend}/{ignorar_motoristas}'
+    paginas_extraidas = cache_resultados.carregar_paginas(impressoes, variante)
+
+    faltantes = [i for i, extracao in enumerate(paginas_extraidas) if extracao is None]
+    total_paginas = len(paginas_extraidas)
+    # As páginas vindas do cache já contam como concluídas
+    _notificar(progresso, 'paginas', total_paginas - len(faltantes), total_paginas)
+    if not faltantes:
+        return paginas_extraidas
+
+    if num_workers > 1:
+        tamanho = -(-len(faltantes) // _num_intervalos(num_workers, progresso))
+        tarefas = [(caminho_pdf, 0, None, motor, backend, ignorar_motoristas, faltantes[inicio:inicio + tamanho])
+                   for inicio in range(0, len(faltantes), tamanho)]
+        extraidas = _extrair_em_paralelo(tarefas, num_workers, progresso, total_paginas,
+                                         total_paginas - len(faltantes))
+    else:
+        extraidas = []
+        for resultado in _iterar_paginas(caminho_pdf, 0, None, motor, backend, ignorar_motoristas, faltantes):
+            extraidas.append(resultado)
+            _notificar(progresso, 'paginas', total_paginas - len(faltantes) + len(extraidas), total_paginas)
+
+    for i, extracao in zip(faltantes, extraidas):
+        paginas_extraidas[i] = extracao
+    cache_resultados.salvar_paginas({impressoes[i]: paginas_extraidas[i] for i in faltantes}, variante)
+
+    return paginas_extraidas
+
+def _extrair_em_paralelo(tarefas: List[Tuple], num_workers: int, progresso: Optional[Progresso] = None,
+                         total_paginas: Optional[int] = None, ja_concluidas: int = 0
+                         ) -> List[Tuple[Optional[Dict], List[pd.DataFrame]]]:
+    paginas_extraidas = []
+    if not tarefas:
+        # PDF sem páginas: nem inicia o pool
+        return paginas_extraidas
+
+    # spawn: o processo pai pode ter threads (ex.: o servidor do Streamlit)
+    executor = ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context('spawn'))
     try:
-        formatos = ['%H:%M:%S', '%H:%M', '%H.%M', '%H,%M']
-        
-        for formato in formatos:
-            try:
-                horario_dt = datetime.strptime(horario_str, formato)
-                horario_dt += timedelta(minutes=tolerancia)  # Tolerância de 5 minutos
-                return horario_dt.time()
-            except ValueError:
-                continue
-        
+        # map preserva a ordem das tarefas, logo a ordem original das páginas
+        for resultado in executor.map(_extrair_intervalo_paginas, tarefas):
+            paginas_extraidas.extend(resultado)
+            _notificar(progresso, 'paginas', ja_concluidas + len(paginas_extraidas), total_paginas)
+    finally:
+        # Num cancelamento, os intervalos ainda não iniciados são descartados
+        executor.shutdown(wait=True, cancel_futures=True)
+    return paginas_extraidas
+
+def _extrair_intervalo_paginas(args: Tuple) -> List[Tuple[Optional[Dict], List[pd.DataFrame]]]:
+    """
+    Abre o PDF e extrai as páginas [inicio, fim) (ou as páginas indicadas).
+    Usada também como tarefa dos processos de extração paralela.
+    """
+    return list(_iterar_paginas(*args))
+
+def _iterar_paginas(caminho_pdf: EntradaPdf, inicio: int, fim: Optional[int], motor: str, backend: str,
+                    ignorar_motoristas: bool, indices: Optional[List[int]] = None
+                    ) -> Iterator[Tuple[Optional[Dict], List[pd.DataFrame]]]:
+    """
+    Extrai as páginas [inicio, fim), ou apenas as de `indices`, uma a uma,
+    liberando o layout de cada página assim que ela é processada.
+    """
+    calibracao = {}
+    with abrir_pdf(caminho_pdf, backend) as pdf:
+        paginas = pdf.pages[inicio:fim] if indices is None else [pdf.pages[i] for i in indices]
+        for pagina in paginas:
+            resultado = extrair_pagina(pagina, motor, calibracao, ignorar_motoristas)
+            pagina.close()
+            yield resultado
+
+def gerar_tabelas_espelho_ponto(caminho_pdf: EntradaPdf, motor: str = 'tabelas', backend: str = 'pdfplumber',
+                                ignorar_motoristas: bool = False) -> Iterator[pd.DataFrame]:
+    """
+    Versão em fluxo de extrair_tabelas_espelho_ponto: entrega a tabela de cada
+    funcionário assim que a chave muda, mantendo em memória apenas as páginas
+    do funcionário atual. Supõe que as páginas de um funcionário são contíguas.
+    """
+    motor = _validar_motor_backend(motor, backend)
+    caminho_pdf = normalizar_entrada_pdf(caminho_pdf)
+
+    chave_atual = None
+    paginas_funcionario = []
+    for info_funcionario, tabelas_ponto in _iterar_paginas(caminho_pdf, 0, None, motor, backend, ignorar_motoristas):
+        if not tabelas_ponto:
+            continue
+
+        chave_funcionario = gerar_chave_funcionario(info_funcionario)
+        if chave_funcionario != chave_atual and paginas_funcionario:
+            yield from consolidar_paginas_extraidas(paginas_funcionario)
+            paginas_funcionario = []
+
+        chave_atual = chave_funcionario
+        paginas_funcionario.append((info_funcionario, tabelas_ponto))
+
+    if paginas_funcionario:
+        yield from consolidar_paginas_extraidas(paginas_funcionario)
+
+def _validar_motor_backend(motor: str, backend: str) -> str:
+    """
+    Valida motor e backend e retorna o motor efetivo.
+    """
+    if motor not in MOTORES_EXTRACAO:
+        raise ValueError(f"Motor de extração inválido: {motor}")
+    if backend not in BACKENDS_PDF:
+        raise ValueError(f"Backend de PDF inválido: {backend}")
+
+    # O pdfium fornece apenas texto posicionado, então usa o motor por coordenadas
+    if backend == 'pdfium':
+        return 'coordenadas'
+    return motor
+
+def extrair_pagina(pagina, motor: str = 'tabelas', calibracao: Optional[Dict] = None,
+                   ignorar_motoristas: bool = False) -> Tuple[Optional[Dict], List[pd.DataFrame]]:
+    """
+    Extrai as informações do funcionário e as tabelas de ponto de uma página.
+    """
+    tabelas_ponto = []
+
+    # Sonda barata: páginas sem cabeçalho de ponto não passam pela extração de tabelas
+    limite_cabecalho = localizar_cabecalho_ponto(pagina)
+    if limite_cabecalho is None:
+        return None, tabelas_ponto
+
+    # Extrai informações do funcionário apenas da região acima da tabela
+    info_funcionario = extrair_info_funcionario(pagina, limite_cabecalho)
+
+    # Motoristas são descartados no resultado final, então nem extrai as tabelas
+    if ignorar_motoristas and info_funcionario and info_funcionario.get('funcao') == 'MOTORISTA':
+        return info_funcionario, tabelas_ponto
+
+    # Extrai tabelas da página
+    tabelas = None
+    if motor == 'coordenadas':
+        tabela = extrair_tabela_por_coordenadas(pagina, calibracao if calibracao is not None else {})
+        if tabela is not None:
+            tabelas = [tabela]
+
+    # Sem calibração possível, volta para o extract_tables genérico
+    if tabelas is None:
+        tabelas = pagina.extract_tables()
+
+    for idx_tabela, tabela in enumerate(tabelas):
+        if not tabela or len(tabela) < 2:
+            continue
+
+        # Verifica se é uma tabela de ponto
+        if not eh_tabela_ponto(tabela):
+            continue
+
+        # Cria DataFrame
+        df = criar_dataframe_ponto(tabela)
+        if df is None or df.empty:
+            continue
+
+        # Adiciona o nome do funcionário como coluna
+        nome_funcionario = info_funcionario.get('nome', 'Nome não identificado') if info_funcionario else 'Nome não identificado'
+        df.insert(0, 'COLABORADOR', nome_funcionario)
+        funcao = info_funcionario.get('funcao', '') if info_funcionario else 'Funcao não identificada'
+        df.insert(0, 'FUNCAO', funcao)
+
+        # Processa mesclagem de células
+        df = processar_celulas_mescladas(df)
+        tabelas_ponto.append(df)
+
+    return info_funcionario, tabelas_ponto
+
+def localizar_cabecalho_ponto(pagina) -> Optional[float]:
+    """
+    Procura, direto nos caracteres da página, a linha de cabeçalho da tabela
+    de ponto (Data, 1a E., ...). Retorna o topo dessa linha ou None.
+    """
+    if not pagina.chars:
         return None
-        
-    except:
+
+    for linha in cluster_objects(pagina.chars, 'top', 3):
+        texto = ''.join(c['text'] for c in sorted(linha, key=lambda c: c['x0']))
+        texto = ''.join(texto.split()).lower()
+        if ('data' in texto and
+                any(rotulo in texto for rotulo in ('1ae', '1ªe', '1as', '1ªs')) and
+                'turno' not in texto):
+            return min(c['top'] for c in linha)
+
+    return None
+
+def extrair_tabela_por_coordenadas(pagina, calibracao: Dict) -> Optional[List[List]]:
+    """
+    Monta a tabela de ponto da página agrupando as palavras pelas colunas
+    do cabeçalho. Retorna None quando o cabeçalho não é encontrado.
+
+    Como no extract_tables, o texto de uma célula mesclada (sem a divisória
+    vertical entre colunas vizinhas) fica na primeira coluna da mesclagem,
+    mesmo quando centralizado.
+    """
+    palavras = pagina.extract_words(keep_blank_chars=True)
+    if not palavras:
         return None
 
+    linhas = cluster_objects(palavras, 'top', 3)
+    linhas = [sorted(linha, key=lambda p: p['x0']) for linha in linhas]
 
-def obter_horario_programado(colaborador: str, dia_semana: str, df_horarios: pd.DataFrame) -> Tuple[Optional[time], Optional[time]]:
-    horario_colab = df_horarios[df_horarios['COLABORADORES'] == colaborador]
-    
-    if horario_colab.empty:
-        return None, None, None
-    
-    # Sábado usa colunas diferentes (ENTRADA.1, SAIDA.1)
-    if dia_semana.lower() in horario_colab['PERIODO.1'].iloc[0].lower():
-        entrada_prog = horario_colab['ENTRADA.1'].iloc[0]
-        saida_prog = horario_colab['SAIDA.1'].iloc[0]
-    elif dia_semana.lower() in horario_colab['PERIODO'].iloc[0].lower():
-        entrada_prog = horario_colab['ENTRADA'].iloc[0]
-        saida_prog = horario_colab['SAIDA'].iloc[0]
-    else:
-        return None, None, None
-    
-    sab2t = horario_colab['SAB.2T'].iloc[0]
-    entrada_prog = converter_para_time(entrada_prog)
-    saida_prog = converter_para_time(saida_prog)
-    
-    return entrada_prog, saida_prog, sab2t
+    # Localiza a linha de cabeçalho
+    idx_cabecalho = None
+    for i, linha in enumerate(linhas):
+        if eh_tabela_ponto([[p['text'] for p in linha]]):
+            idx_cabecalho = i
+            break
+    if idx_cabecalho is None:
+        return None
+
+    cabecalho = linhas[idx_cabecalho]
+    rotulos = [p['text'].strip() for p in cabecalho]
+    posicoes = [p['x0'] for p in cabecalho]
+
+    # Reaproveita a calibração enquanto o cabeçalho estiver na mesma posição
+    mesma_calibracao = (
+        calibracao.get('rotulos') == rotulos and
+        all(abs(a - b) <= 2 for a, b in zip(calibracao['posicoes'], posicoes))
+    )
+    if not mesma_calibracao:
+        calibracao['rotulos'] = rotulos
+        calibracao['posicoes'] = posicoes
+        # Limite entre colunas: ponto médio entre rótulos vizinhos
+        calibracao['limites'] = [
+            (cabecalho[j]['x1'] + cabecalho[j + 1]['x0']) / 2
+            for j in range(len(cabecalho) - 1)
+        ]
+    limites = calibracao['limites']
 
+    # Divisórias verticais da grade: a de cada limite fica entre os rótulos
+    # vizinhos do cabeçalho
+    faixas = [(cabecalho[j]['x1'], cabecalho[j + 1]['x0']) for j in range(len(limites))]
+    verticais = [e for e in pagina.edges if e['orientation'] == 'v']
 
+    def divisorias(y: float) -> List[bool]:
+        return [
+            any(x0 <= e['x0'] <= x1 and e['top'] <= y <= e['bottom'] for e in verticais)
+            for x0, x1 in faixas
+        ]
+
+    # Sem divisória no cabeçalho (tabela sem grade), nada é tratado como mesclado
+    com_divisoria = divisorias((cabecalho[0]['top'] + cabecalho[0]['bottom']) / 2)
+
+    def coluna(palavra: Dict) -> int:
+        for j, limite in enumerate(limites):
+            if palavra['x0'] < limite:
+                return j
+        return len(limites)
+
+    tabela = [rotulos]
+    fundo_anterior = cabecalho[0]['bottom']
+    for linha in linhas[idx_cabecalho + 1:]:
+        meio = (min(p['top'] for p in linha) + max(p['bottom'] for p in linha)) / 2
+        mescladas = [antes and not agora for antes, agora in zip(com_divisoria, divisorias(meio))]
+        celulas = [''] * len(rotulos)
+        for palavra in linha:
+            j = coluna(palavra)
+            while j > 0 and mescladas[j - 1]:
+                j -= 1
+            celulas[j] = f"{celulas[j]} {palavra['text']}" if celulas[j] else palavra['text']
+
+        altura = linha[0]['bottom'] - linha[0]['top']
+        if PADRAO_DATA.fullmatch(celulas[0].strip()):
+            tabela.append(celulas)
+        elif len(tabela) > 1 and linha[0]['top'] - fundo_anterior < altura / 2:
+            # Quebra de linha dentro da célula
+            tabela[-1] = [f"{a}\n{b}" if a and b else a or b for a, b in zip(tabela[-1], celulas)]
+        else:
+            break
+        fundo_anterior = max(p['bottom'] for p in linha)
 
-def extrair_tabelas_espelho_ponto(caminho_pdf: str) -> List[pd.DataFrame]:
+    return tabela if len(tabela) > 1 else None
+
+def consolidar_paginas_extraidas(paginas_extraidas: List[Tuple[Optional[Dict], List[pd.DataFrame]]]) -> List[pd.DataFrame]:
     """
-    Extrai tabelas de espelho de ponto de PDF, tratando casos onde
-    as tabelas se estendem por múltiplas páginas.
+    Junta as tabelas das páginas, na ordem original, por funcionário.
+
+    As páginas de continuação são guardadas como blocos de linhas, já
+    alinhados ao cabeçalho da primeira tabela do funcionário, e o DataFrame
+    de cada funcionário é montado uma única vez no final.
     """
-    tabelas_encontradas = []
     funcionarios_processados = {}
-    
-    with pdfplumber.open(caminho_pdf) as pdf:
-        for num_pagina, pagina in enumerate(pdf.pages):
-            # Extrai informações do funcionário da página
-            info_funcionario = extrair_info_funcionario(pagina)
-            
-            # Extrai tabelas da página
-            tabelas = pagina.extract_tables()
-            
-            for idx_tabela, tabela in enumerate(tabelas):
-                if not tabela or len(tabela) < 2:
-                    continue
-                
-                # Verifica se é uma tabela de ponto
-                if not eh_tabela_ponto(tabela):
-                    continue
-                
-                # Cria DataFrame
-                df = criar_dataframe_ponto(tabela)
-                if df is None or df.empty:
-                    continue
-                
-                # Adiciona o nome do funcionário como coluna
-                nome_funcionario = info_funcionario.get('nome', 'Nome não identificado') if info_funcionario else 'Nome não identificado'
-                df.insert(0, 'COLABORADOR', nome_funcionario)
-                funcao = info_funcionario.get('funcao', '') if info_funcionario else 'Funcao não identificada'
-                df.insert(0, 'FUNCAO', funcao)
-
-                # Processa mesclagem de células
-                df = processar_celulas_mescladas(df)
-                
-                # Verifica se é continuação de uma tabela anterior
-                chave_funcionario = gerar_chave_funcionario(info_funcionario)
-                
-                if chave_funcionario in funcionarios_processados:
-                    # Concatena com a tabela anterior do mesmo funcionário
-                    df_anterior = funcionarios_processados[chave_funcionario]
-                    df_combinado = combinar_tabelas_funcionario(df_anterior, df)
-                    funcionarios_processados[chave_funcionario] = df_combinado
-                else:
-                    # Primeira tabela deste funcionário
-                    funcionarios_processados[chave_funcionario] = df
-    
-    # Converte o dicionário em lista de DataFrames
-    for df in funcionarios_processados.values():
+
+    for info_funcionario, tabelas_ponto in paginas_extraidas:
+        if not tabelas_ponto:
+            continue
+
+        chave_funcionario = gerar_chave_funcionario(info_funcionario)
+        for df in tabelas_ponto:
+            if chave_funcionario not in funcionarios_processados:
+                # Primeira tabela deste funcionário define o cabeçalho
+                funcionarios_processados[chave_funcionario] = (df.columns, [df.to_numpy(dtype=object)])
+                continue
+
+            # Continuação de uma tabela anterior
+            colunas, blocos = funcionarios_processados[chave_funcionario]
+            if list(df.columns) == list(colunas):
+                blocos.append(df.to_numpy(dtype=object))
+            elif not colunas.is_unique:
+                print("Erro ao combinar tabelas: cabeçalho com colunas repetidas")
+            else:
+                blocos.append(alinhar_linhas(df.to_numpy(dtype=object), len(colunas)))
+
+    tabelas_encontradas = []
+    for colunas, blocos in funcionarios_processados.values():
+        df = pd.DataFrame(np.concatenate(blocos), columns=colunas)
+
         # Remove linhas completamente vazias
         df = df.loc[~(df == '').all(axis=1)]
         df = df.reset_index(drop=True)
         tabelas_encontradas.append(df)
-    
+
     return tabelas_encontradas
 
-def extrair_info_funcionario(pagina) -> Optional[Dict]:
+def extrair_info_funcionario(pagina, limite_cabecalho: Optional[float] = None) -> Optional[Dict]:
     """
-    Extrai informações do funcionário do texto da página.
+    Extrai informações do funcionário do texto da página. Com limite_cabecalho,
+    lê apenas a região do cabeçalho, acima dessa coordenada.
     """
+    if limite_cabecalho is not None:
+        x0, topo, x1, _ = pagina.bbox
+        pagina = pagina.crop((x0, topo, x1, limite_cabecalho))
+
     texto = pagina.extract_text()
     if not texto:
         return None
-    
+
     info = {}
-    
-    # Busca por matrícula
-    match_matricula = re.search(r'Matrícula:\s*(\d+\s*-\s*\d+)', texto)
-    if match_matricula:
-        info['matricula'] = match_matricula.group(1).strip()
-
-    # Busca por Funcao
-    match_funcao = re.search(r"Função:\s*(\d+)\s*-\s*(.+)", texto)
-    if match_funcao:
-        nome_funcao = match_funcao.group(2).strip()
-        info['funcao'] = "MOTORISTA" if "MOTORISTA" in nome_funcao.upper() else ""
-
-    # Busca por nome
-    match_nome = re.search(r'Nome:\s*([A-Z\s]+)', texto)
-    if match_nome:
-        info['nome'] = match_nome.group(1).strip()
-    
-    # Busca por CPF
-    match_cpf = re.search(r'CPF:\s*([\d\.\-]+)', texto)
-    if match_cpf:
-        info['cpf'] = match_cpf.group(1).strip()
-    
-    # Busca por período
-    match_periodo = re.search(r'(\d{2}/\d{2}/\d{4})\s*-\s*(\d{2}/\d{2}/\d{4})', texto)
-    if match_periodo:
-        info['periodo_inicio'] = match_periodo.group(1)
-        info['periodo_fim'] = match_periodo.group(2)
-    
+
+    # Busca matrícula, função, nome, CPF e período numa única varredura
+    for match in PADRAO_CABECALHO.finditer(texto):
+        campo = match.lastgroup
+        if campo == 'periodo_fim':
+            campo = 'periodo_inicio'
+        if campo in info:
+            continue
+
+        if campo == 'funcao':
+            nome_funcao = match.group('funcao').strip()
+            info['funcao'] = "MOTORISTA" if "MOTORISTA" in nome_funcao.upper() else ""
+        elif campo == 'periodo_inicio':
+            info['periodo_inicio'] = match.group('periodo_inicio')
+            info['periodo_fim'] = match.group('periodo_fim')
+        else:
+            info[campo] = match.group(campo).strip()
+
+        if len(info) == 6:
+            break
+
     return info if info else None
 
 def eh_tabela_ponto(tabela: List[List]) -> bool:
@@ -269,92 +769,43 @@ def gerar_chave_funcionario(info_funcionario: Optional[Dict]) -> str:
     
     return f"{matricula}_{cpf}_{nome}".replace(' ', '_')
 
-def combinar_tabelas_funcionario(df1: pd.DataFrame, df2: pd.DataFrame) -> pd.DataFrame:
+def alinhar_linhas(valores: np.ndarray, num_colunas: int) -> np.ndarray:
     """
-    Combina duas tabelas do mesmo funcionário.
+    Alinha por posição as linhas de uma página de continuação ao cabeçalho
+    de referência: colunas extras são descartadas e as faltantes ficam vazias.
     """
-    try:
-        # Verifica se as colunas são compatíveis
-        if list(df1.columns) != list(df2.columns):
-            # Tenta alinhar as colunas
-            df2 = alinhar_colunas(df1, df2)
-        
-        # Combina os DataFrames
-        df_combinado = pd.concat([df1, df2], ignore_index=True)
-        
-        return df_combinado
-        
-    except Exception as e:
-        print(f"Erro ao combinar tabelas: {e}")
-        return df1  # Retorna a primeira tabela em caso de erro
+    if valores.shape[1] >= num_colunas:
+        return valores[:, :num_colunas]
 
-def alinhar_colunas(df_ref: pd.DataFrame, df_target: pd.DataFrame) -> pd.DataFrame:
-    """
-    Alinha as colunas do df_target com as do df_ref.
-    """
-    colunas_ref = list(df_ref.columns)
-    colunas_target = list(df_target.columns)
-    
-    # Se o número de colunas for diferente, ajusta
-    if len(colunas_target) != len(colunas_ref):
-        # Adiciona colunas vazias se necessário
-        while len(colunas_target) < len(colunas_ref):
-            colunas_target.append('')
-        
-        # Remove colunas extras se necessário
-        colunas_target = colunas_target[:len(colunas_ref)]
-    
-    # Cria um novo DataFrame com as colunas alinhadas
-    df_alinhado = pd.DataFrame(columns=colunas_ref)
-    
-    for i, linha in df_target.iterrows():
-        nova_linha = {}
-        for j, col_ref in enumerate(colunas_ref):
-            if j < len(linha):
-                nova_linha[col_ref] = linha.iloc[j]
-            else:
-                nova_linha[col_ref] = ''
-        df_alinhado = pd.concat([df_alinhado, pd.DataFrame([nova_linha])], ignore_index=True)
-    
-    return df_alinhado
+    faltantes = np.full((valores.shape[0], num_colunas - valores.shape[1]), '', dtype=object)
+    return np.hstack([valores, faltantes])
 
 def processar_celulas_mescladas(df: pd.DataFrame) -> pd.DataFrame:
     """
     Processa células mescladas no DataFrame.
     """
-    df_processado = df.copy()
-    
-    # Processa mesclagem horizontal
-    for i in df_processado.index:
-        colunas = list(df_processado.columns)
-        for j, coluna in enumerate(colunas):
-            valor = df_processado.loc[i, coluna]
-            if pd.notna(valor) and str(valor).strip():
-                valor_str = str(valor).strip()
-                
-                # Identifica padrões de mesclagem horizontal
-                eh_mesclado = (
-                    '**' in valor_str or
-                    'AUSENTE' in valor_str.upper() or
-                    'D.S.R' in valor_str.upper() or
-                    'PERIODO' in valor_str.upper() or
-                    'BANCO' in valor_str.upper() or
-                    'FERIADO' in valor_str.upper() or
-                    'HORARIO JUSTIFICADO' in valor_str.upper() or
-                    'DESCONTO EM FOLHA' in valor_str.upper()
-                )
-                
-                if eh_mesclado:
-                    # Propaga valor para células vazias à direita
-                    for k in range(j + 1, len(colunas)):
-                        proxima_coluna = colunas[k]
-                        proximo_valor = df_processado.loc[i, proxima_coluna]
-                        if pd.isna(proximo_valor) or str(proximo_valor).strip() == '':
-                            df_processado.loc[i, proxima_coluna] = valor_str
-                        else:
-                            break
-    
-    return df_processado
+    if df.empty:
+        return df.copy()
+
+    valores = df.to_numpy(dtype=object)
+    formato = valores.shape
+    celulas = pd.Series(valores.ravel())
+    texto = celulas.astype(str).str.strip()
+
+    # Identifica padrões de mesclagem horizontal numa única passada
+    vazias = (celulas.isna() | (texto == '')).to_numpy()
+    mescladas = ~vazias & texto.str.upper().str.contains(PADRAO_MESCLADO).to_numpy()
+
+    # Marcadores propagam o próprio valor; células preenchidas não mescladas
+    # bloqueiam a propagação; células vazias recebem o valor à esquerda
+    propagacao = np.where(mescladas, texto.to_numpy(dtype=object), _BLOQUEIO_MESCLAGEM)
+    propagacao[vazias] = None
+    propagado = pd.DataFrame(propagacao.reshape(formato)).ffill(axis=1).to_numpy()
+
+    preencher = vazias.reshape(formato) & pd.notna(propagado) & (propagado != _BLOQUEIO_MESCLAGEM)
+    valores = np.where(preencher, propagado, valores)
+
+    return pd.DataFrame(valores, index=df.index, columns=df.columns)
 
 def identificar_situacoes_especiais(valor: Any) -> Dict[str, Any]:
     if pd.isna(valor) or valor == '':
@@ -380,194 +831,260 @@ def identificar_situacoes_especiais(valor: Any) -> Dict[str, Any]:
     return {'tipo': 'horario', 'valor_original': valor}
 
 
+def classificar_situacoes(valores: pd.Series) -> pd.Series:
+    """
+    Versão vetorizada de identificar_situacoes_especiais: retorna o tipo
+    de situação de cada valor como Categorical (TIPOS_SITUACAO). Cada valor
+    distinto é classificado uma única vez.
+    """
+    codigos, distintos = pd.factorize(valores)
+    distintos = pd.Series(distintos, dtype=object)
+    texto = distintos.astype(str).str.strip().str.upper()
+
+    tipos = np.select(
+        [
+            distintos == '',
+            texto.str.contains('**', regex=False) & texto.str.contains('AUSENT', regex=False),
+            texto.str.contains('ISENTO', regex=False),
+            texto.str.contains('FÉRIAS|FERIAS'),
+            texto.str.contains(r'D\.S\.R|DSR'),
+            texto.str.contains('REGISTRO NO POSITRON', regex=False),
+        ],
+        [TIPOS_SITUACAO.index(tipo) for tipo in ('vazio', 'ausente', 'isento', 'ferias', 'dsr', 'registro_positron')],
+        default=TIPOS_SITUACAO.index('horario')
+    )
+
+    # Valores nulos ficam com o código -1 no factorize e são 'vazio'
+    tipos = np.append(tipos, TIPOS_SITUACAO.index('vazio'))[codigos]
+    return pd.Series(pd.Categorical.from_codes(tipos, categories=TIPOS_SITUACAO), index=valores.index)
+
+
+def _coluna(df: pd.DataFrame, nome: str) -> pd.Series:
+    """
+    Coluna do DataFrame ou, se ausente, uma coluna de strings vazias.
+    """
+    if nome in df.columns:
+        return df[nome]
+    return pd.Series('', index=df.index, dtype=object)
+
+
 def limpar_e_converter_horarios(df: pd.DataFrame) -> pd.DataFrame:
-    df_limpo = df.copy()
-    colunas_horario = ['1a E.', '1a S.', '2a E.', '2a S.', '3a E.', '3a S.']
-    
+    return limpar_horarios(df.copy())
+
+
+def limpar_horarios(df_limpo: pd.DataFrame) -> pd.DataFrame:
+    """
+    Etapa de limpeza das colunas de horário, aplicada no próprio DataFrame.
+    """
     if 'SITUACAO_ESPECIAL' not in df_limpo.columns:
         df_limpo['SITUACAO_ESPECIAL'] = ''
-    
-    def limpar_horario(valor: Any) -> Any:
-        situacao = identificar_situacoes_especiais(valor)
-        
-        if situacao['tipo'] != 'horario':
-            return valor
-            
-        valor_str = str(valor).strip()
-        # Remove caracteres específicos do sistema de ponto
-        valor_limpo = valor_str.replace('O', '').replace('I', '').replace('P', '')
-        valor_limpo = valor_limpo.strip()
-        
-        if not valor_limpo:
-            return None
-            
-        return valor_limpo
-
-    # Identifica situações especiais por linha
-    for idx, row in df_limpo.iterrows():
-        situacoes_especiais = []
-        primeira_entrada = row.get('1a E.', '')
-        situacao_primeira = identificar_situacoes_especiais(primeira_entrada)
-        
-        if situacao_primeira['tipo'] in ['ausente', 'isento', 'ferias', 'dsr']:
-            situacoes_especiais.append(situacao_primeira['tipo'])
-        
-        if situacoes_especiais:
-            df_limpo.at[idx, 'SITUACAO_ESPECIAL'] = ', '.join(situacoes_especiais)
-    
-    for coluna in colunas_horario:
+
+    # Situação do dia pela primeira entrada, classificada uma vez e lida pelas etapas seguintes
+    situacao_primeira = classificar_situacoes(_coluna(df_limpo, '1a E.'))
+    df_limpo['SITUACAO'] = situacao_primeira
+    especiais = situacao_primeira.isin(['ausente', 'isento', 'ferias', 'dsr'])
+    df_limpo.loc[especiais, 'SITUACAO_ESPECIAL'] = situacao_primeira[especiais].astype(str)
+
+    for coluna in COLUNAS_HORARIO:
         if coluna in df_limpo.columns:
-            df_limpo[coluna] = df_limpo[coluna].apply(limpar_horario)
+            valores = df_limpo[coluna]
+            eh_horario = classificar_situacoes(valores) == 'horario'
+
+            # Remove caracteres específicos do sistema de ponto
+            valor_limpo = valores.astype(str).str.strip().str.replace('[OIP]', '', regex=True).str.strip()
+            valor_limpo = valor_limpo.astype(object).where(valor_limpo != '', None)
+
+            # infer_objects mantém a mesma inferência de tipo do antigo apply
+            df_limpo[coluna] = valores.astype(object).where(~eh_horario, valor_limpo).infer_objects()
     
     return df_limpo
 
 
 def transformar_ponto(df: pd.DataFrame, lista_gestores: Optional[List[str]] = None) -> pd.DataFrame:
-    df_transformed = df.copy()
-    
-    
-    novas_colunas = ["AUSENCIA", "ENTRADA", "SAIDA INTERVALO", "VOLTA INTERVALO", "SAIDA", "ALERTA"]
-    for col in novas_colunas:
+    return marcar_ponto(df.copy(), lista_gestores)
+
+
+def marcar_ponto(df_transformed: pd.DataFrame, lista_gestores: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Etapa que preenche ausência, marcações e alerta, aplicada no próprio DataFrame.
+    """
+    for col in COLUNAS_MARCACAO:
         if col not in df_transformed.columns:
             df_transformed[col] = ""
     
-    def is_empty(val: Any) -> bool:
-        return pd.isna(val) or val == "" or val == " "
-    
-    for idx, row in df_transformed.iterrows():
-        dia_semana = row.get('Dia', '')
-        primeira_entrada = row.get('1a E.', '')
-        primeira_saida = row.get('1a S.', '')
-        segunda_entrada = row.get('2a E.', '')
-        segunda_saida = row.get('2a S.', '')
-        observacao = row.get('Observação', '')
-        colaborador = row.get('COLABORADOR', '')  
-        situacao_primeira = identificar_situacoes_especiais(primeira_entrada)
-        
-        # Gestores sempre sem alerta
-        if colaborador in lista_gestores:
-            df_transformed.at[idx, 'ALERTA'] = ''
-            continue
-        
-        # Com observação, sem alerta
-        if not is_empty(observacao):
-            df_transformed.at[idx, 'ALERTA'] = ''
-            continue
+    def is_empty(val: pd.Series) -> pd.Series:
+        return val.isna() | (val == "") | (val == " ")
 
-        elif dia_semana == 'Domingo':
-            df_transformed.at[idx, 'ALERTA'] = ''
-            continue
-        
-        elif situacao_primeira['tipo'] == 'ausente':
-            df_transformed.at[idx, 'AUSENCIA'] = 'SIM'
-            df_transformed.at[idx, 'ALERTA'] = 'S'
-            continue
-        
-        elif situacao_primeira['tipo'] in ['isento', 'ferias', 'registro_positron']:
-            df_transformed.at[idx, 'ALERTA'] = ''
-            continue
-        
-        elif situacao_primeira['tipo'] == 'dsr':
-            df_transformed.at[idx, 'ALERTA'] = ''
-            continue
+    dia_semana = _coluna(df_transformed, 'Dia')
+    primeira_entrada = _coluna(df_transformed, '1a E.')
+    primeira_saida = _coluna(df_transformed, '1a S.')
+    segunda_entrada = _coluna(df_transformed, '2a E.')
+    segunda_saida = _coluna(df_transformed, '2a S.')
+    observacao = _coluna(df_transformed, 'Observação')
+    colaborador = _coluna(df_transformed, 'COLABORADOR')
+    if 'SITUACAO' in df_transformed.columns:
+        situacao_primeira = df_transformed['SITUACAO']
+    else:
+        situacao_primeira = classificar_situacoes(primeira_entrada)
 
-        # Sábado: verifica 2 marcações
-        elif dia_semana == 'Sabado':
-            count = 0
-            if not is_empty(primeira_entrada): 
-                df_transformed.at[idx, 'ENTRADA'] = 'OK'
-                count += 1
-            if not is_empty(primeira_saida):
-                df_transformed.at[idx, 'SAIDA'] = 'OK'
-                count += 1
-            
-            df_transformed.at[idx, 'ALERTA'] = '' if count >= 2 else 'S'
-            continue
-        
-        # Outros dias da semana
-        else:
-            marcacoes_vazias = (is_empty(primeira_entrada) and 
-                              is_empty(primeira_saida) and 
-                              is_empty(segunda_entrada) and 
-                              is_empty(segunda_saida))
-            
-            if marcacoes_vazias:
-                if not is_empty(observacao):
-                    df_transformed.at[idx, 'ALERTA'] = ''
-                else:
-                    df_transformed.at[idx, 'AUSENCIA'] = 'SIM'
-                    df_transformed.at[idx, 'ALERTA'] = 'S'
-            else:
-                marcacoes = [
-                    ('ENTRADA', primeira_entrada),
-                    ('SAIDA INTERVALO', primeira_saida),
-                    ('VOLTA INTERVALO', segunda_entrada),
-                    ('SAIDA', segunda_saida)
-                ]
-
-                qtd_marcacoes = 0
-                for nome_campo, valor in marcacoes:
-                    if not is_empty(valor):
-                        df_transformed.at[idx, nome_campo] = 'OK'
-                        qtd_marcacoes += 1
-                
-                df_transformed.at[idx, 'ALERTA'] = '' if qtd_marcacoes >= 4 else 'S'
-            continue               
+    # Ramos avaliados na mesma precedência da regra original
+    gestor = colaborador.isin(lista_gestores or [])
+    com_observacao = ~gestor & ~is_empty(observacao)
+    restante = ~gestor & ~com_observacao
+    domingo = restante & (dia_semana == 'Domingo')
+    restante &= ~domingo
+    ausente = restante & (situacao_primeira == 'ausente')
+    restante &= ~ausente
+    sem_alerta = restante & situacao_primeira.isin(['isento', 'ferias', 'registro_positron', 'dsr'])
+    restante &= ~sem_alerta
+    sabado = restante & (dia_semana == 'Sabado')
+    dia_util = restante & ~sabado
+
+    marcou_e1 = ~is_empty(primeira_entrada)
+    marcou_s1 = ~is_empty(primeira_saida)
+    marcou_e2 = ~is_empty(segunda_entrada)
+    marcou_s2 = ~is_empty(segunda_saida)
+    qtd_marcacoes = marcou_e1.astype(int) + marcou_s1.astype(int) + marcou_e2.astype(int) + marcou_s2.astype(int)
+    sem_marcacoes = dia_util & (qtd_marcacoes == 0)
+    com_marcacoes = dia_util & ~sem_marcacoes
+
+    # Sábado: verifica 2 marcações; outros dias: 4 marcações
+    sabado_ok = (marcou_e1.astype(int) + marcou_s1.astype(int)) >= 2
+
+    df_transformed['AUSENCIA'] = np.where(ausente | sem_marcacoes, 'SIM', df_transformed['AUSENCIA'])
+    df_transformed['ENTRADA'] = np.where((sabado | com_marcacoes) & marcou_e1, 'OK', df_transformed['ENTRADA'])
+    df_transformed['SAIDA INTERVALO'] = np.where(com_marcacoes & marcou_s1, 'OK', df_transformed['SAIDA INTERVALO'])
+    df_transformed['VOLTA INTERVALO'] = np.where(com_marcacoes & marcou_e2, 'OK', df_transformed['VOLTA INTERVALO'])
+    df_transformed['SAIDA'] = np.select(
+        [sabado & marcou_s1, com_marcacoes & marcou_s2],
+        ['OK', 'OK'],
+        default=df_transformed['SAIDA']
+    )
+    df_transformed['ALERTA'] = np.select(
+        [
+            gestor | com_observacao | domingo | sem_alerta,
+            ausente | sem_marcacoes,
+            sabado,
+            com_marcacoes,
+        ],
+        [
+            '',
+            'S',
+            np.where(sabado_ok, '', 'S'),
+            np.where(qtd_marcacoes >= 4, '', 'S'),
+        ],
+        default=df_transformed['ALERTA']
+    )
     
     return df_transformed
 
 
 def salvar_tabelas_concatenadas(tabelas: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatena as tabelas dos funcionários na tabela única sobre a qual o
+    pipeline trabalha. É a única cópia dos dados feita no processamento.
+    """
     if not tabelas:
         return pd.DataFrame()
 
-    tabelas_com_origem = []
-    for i, tabela in enumerate(tabelas):
-        tabela_copy = tabela.copy()
-        tabelas_com_origem.append(tabela_copy)
+    return pd.concat(tabelas, ignore_index=True, sort=False)
 
-    tabela_consolidada = pd.concat(tabelas_com_origem, ignore_index=True, sort=False)
-    return tabela_consolidada
 
-def exec_parte1(caminho_pdf: str, lista_gestores: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+class Etapa(NamedTuple):
+    """
+    Etapa do pipeline: função que recebe a tabela consolidada e a devolve
+    (o mesmo objeto quando altera no local), com as colunas que lê e escreve.
+    """
+    nome: str
+    funcao: Callable[[pd.DataFrame], pd.DataFrame]
+    le: Tuple[str, ...]
+    escreve: Tuple[str, ...]
+
+
+class PipelinePonto:
+    """
+    Executa as etapas em sequência sobre uma única tabela consolidada,
+    sem cópias entre as etapas.
+    """
+
+    def __init__(self, etapas: List[Etapa]):
+        self.etapas = list(etapas)
+
+    def executar(self, tabela: pd.DataFrame, progresso: Optional[Progresso] = None) -> pd.DataFrame:
+        """
+        Executa as etapas em ordem. O callback progresso é chamado ao fim de
+        cada etapa com o número de funcionários da tabela.
+        """
+        funcionarios = None
+        if progresso is not None and 'COLABORADOR' in tabela.columns:
+            funcionarios = tabela['COLABORADOR'].nunique()
+        for etapa in self.etapas:
+            tabela = etapa.funcao(tabela)
+            _notificar(progresso, etapa.nome, funcionarios or 0, funcionarios or 0)
+        return tabela
+
+
+def filtrar_funcao(tabela: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mantém apenas as linhas com função vazia (descarta motoristas).
+    """
+    funcao = tabela['FUNCAO']
+    manter = funcao.isna() | (funcao == '') | (funcao == 'Funcao não identificada')
+    if manter.all():
+        return tabela
+    return tabela.drop(index=tabela.index[~manter])
+
+
+def normalizar_colaborador(tabela: pd.DataFrame) -> pd.DataFrame:
+    tabela['COLABORADOR'] = tabela['COLABORADOR'].str.removesuffix(' C')
+    return tabela
+
+
+def etapas_parte1(lista_gestores: Optional[List[str]] = None) -> List[Etapa]:
+    """
+    Etapas de limpeza e transformação das tabelas extraídas.
+    """
+    return [
+        Etapa('filtrar_funcao', filtrar_funcao, ('FUNCAO',), ()),
+        Etapa('limpar_horarios', limpar_horarios, COLUNAS_HORARIO,
+              COLUNAS_HORARIO + ('SITUACAO', 'SITUACAO_ESPECIAL')),
+        Etapa('marcar_ponto', lambda tabela: marcar_ponto(tabela, lista_gestores),
+              ('Dia', '1a E.', '1a S.', '2a E.', '2a S.', 'Observação', 'COLABORADOR', 'SITUACAO'),
+              COLUNAS_MARCACAO),
+        Etapa('normalizar_colaborador', normalizar_colaborador, ('COLABORADOR',), ('COLABORADOR',)),
+    ]
+
+
+def etapas_parte2(lista_gestores: List[str], indice: 'IndiceHorarios') -> List[Etapa]:
+    """
+    Etapa de conferência das marcações com o horário programado.
+    """
+    return [
+        Etapa('verificar_horarios', lambda tabela: verificar_horarios(tabela, lista_gestores, indice),
+              ('COLABORADOR', 'Dia', 'Observação', '1a E.', '1a S.', '2a E.', '2a S.') + COLUNAS_MARCACAO,
+              ('ENTRADA', 'SAIDA INTERVALO', 'VOLTA INTERVALO', 'SAIDA', 'ALERTA')),
+    ]
+
+
+def processar_tabelas(tabelas: List[pd.DataFrame], lista_gestores: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Aplica limpeza e transformação às tabelas extraídas e
+    consolida o resultado, sem motoristas e com as colunas de saída.
+    """
+    # A mesclagem de células já foi processada em extrair_pagina
+    tabela = PipelinePonto(etapas_parte1(lista_gestores)).executar(salvar_tabelas_concatenadas(tabelas))
+    return tabela[COLUNAS_PARTE1]
+
+def exec_parte1(caminho_pdf: EntradaPdf, lista_gestores: Optional[List[str]] = None, num_workers: int = 1,
+                motor: str = 'tabelas', backend: str = 'pdfplumber') -> Optional[pd.DataFrame]:
     try:
-        tabelas = extrair_tabelas_espelho_ponto(caminho_pdf)
+        tabelas = extrair_tabelas_espelho_ponto(caminho_pdf, num_workers=num_workers, motor=motor,
+                                                backend=backend, ignorar_motoristas=True)
 
         if not tabelas:
             return None
 
-        tabelas_processadas = []
-        for i, tabela in enumerate(tabelas):
-            tabela_processada = processar_celulas_mescladas(tabela)
-            tabelas_processadas.append(tabela_processada)
-            
-        tabelas_limpas = []
-        for tabela in tabelas_processadas:
-            tabela_limpa = limpar_e_converter_horarios(tabela)
-            tabelas_limpas.append(tabela_limpa)
-
-        tabelas_transformadas = []
-        for i, tabela in enumerate(tabelas_limpas):
-            tabela_transformada = transformar_ponto(tabela, lista_gestores)
-            tabelas_transformadas.append(tabela_transformada)
-
-        tabela_final = salvar_tabelas_concatenadas(tabelas_transformadas)
-        
-        # FILTRAR APENAS LINHAS COM FUNÇÃO VAZIA OU NaN
-        tabela_final = tabela_final[
-            (tabela_final['FUNCAO'].isna()) | 
-            (tabela_final['FUNCAO'] == '') | 
-            (tabela_final['FUNCAO'] == 'Funcao não identificada')
-        ]
-
-        # Selecionar colunas
-        tabela_final = tabela_final[['Dia', '1a E.', '1a S.', '2a E.',
-                    '2a S.', '3a E.', '3a S.', 'Abono', 'Observação', 'Data', 'COLABORADOR', 
-                    'AUSENCIA', 'ENTRADA', 'SAIDA INTERVALO', 'VOLTA INTERVALO', 'SAIDA', 'ALERTA']]
-        
-        tabela_final['COLABORADOR'] = tabela_final['COLABORADOR'].str.removesuffix(' C')
-
-        return tabela_final
+        return processar_tabelas(tabelas, lista_gestores)
 
     except FileNotFoundError:
         print(f"Erro: Arquivo {caminho_pdf} não encontrado.")
@@ -579,83 +1096,111 @@ def exec_parte1(caminho_pdf: str, lista_gestores: Optional[List[str]] = None) ->
         return None
     
 
-def exec_parte2(tabela_ponto: pd.DataFrame, lista_gestores: List[str] = nomes_colaboradores.GESTORES) -> pd.DataFrame:
-    horarios = import_horarios()
-    tabela_ponto = tabela_ponto.copy()
-    
-    for idx, row in tabela_ponto.iterrows():
-        
-        nome = row.get('COLABORADOR', '')
-        dia_semana = row.get('Dia', '')
-        ausencia = row.get('AUSENCIA', '')
-        
-        observacao = row.get('Observação', '')
+def converter_coluna_para_minutos(valores: pd.Series, tolerancia: int = 5) -> pd.Series:
+    """
+    Converte uma coluna de horários em minutos desde a meia-noite (com a
+    tolerância somada e os segundos como fração), ou NaN quando não há
+    horário. Cada valor distinto é convertido uma única vez.
+    """
+    minutos = {}
+    for valor in pd.unique(valores):
+        segundos = segundos_do_horario(valor, tolerancia)
+        minutos[valor] = np.nan if segundos is None else segundos / 60
+    return valores.map(minutos).astype(float)
 
-        if nome in lista_gestores or observacao != '' or dia_semana == 'Domingo':
-            tabela_ponto.at[idx, 'ALERTA'] = ''
-            continue
-        
-        if ausencia == 'SIM':
-            continue
-        # Processamento para horário normal
-       
-        entrada_prog, saida_prog, sab2t = obter_horario_programado(nome, dia_semana, horarios)
-        
-        entrada = converter_para_time(row.get('1a E.', ''))
-        
-        if dia_semana == 'Sabado' and sab2t == 'N':
-            saida = converter_para_time(row.get('1a S.', ''))
 
-        elif dia_semana == 'Sabado' and sab2t == 'S':
-            saida = converter_para_time(row.get('2a S.', ''))
-            saida_almoco = converter_para_time(row.get('1a S.', ''))
-            volta_almoco = converter_para_time(row.get('2a E.', ''))            
-        else:
-            saida = converter_para_time(row.get('2a S.', ''))
-            saida_almoco = converter_para_time(row.get('1a S.', ''))
-            volta_almoco = converter_para_time(row.get('2a E.', ''))
+def resolver_horarios_programados(tabela_ponto: pd.DataFrame, indice: IndiceHorarios) -> pd.DataFrame:
+    """
+    Resolve, para cada linha, a entrada e saída programadas (em minutos) e o
+    SAB.2T, consultando o índice de horários por colaborador e dia da semana.
+    Cada par (colaborador, dia) distinto é consultado uma única vez.
+    """
+    pares = tabela_ponto[['COLABORADOR', 'Dia']]
+    distintos = pares.drop_duplicates()
+    resolvidos = pd.DataFrame(
+        [indice.buscar(colaborador, dia) for colaborador, dia in zip(distintos['COLABORADOR'], distintos['Dia'])],
+        index=distintos.index, columns=['ENTRADA_PROG', 'SAIDA_PROG', 'SAB2T'],
+    )
+    resultado = pares.merge(distintos.join(resolvidos), how='left', on=['COLABORADOR', 'Dia'])
+    return resultado[['ENTRADA_PROG', 'SAIDA_PROG', 'SAB2T']].set_axis(tabela_ponto.index)
 
 
-        if entrada_prog is None or saida_prog is None:
-            tabela_ponto.at[idx, 'ALERTA'] = 'S/ ENTRADA PROGRAMADA'
-            continue
-    
-        if entrada is None:
-            tabela_ponto.at[idx, 'ENTRADA'] = 'SEM MARCAÇÃO'
-            tabela_ponto.at[idx, 'ALERTA'] = 'S'
-        else:
-            if entrada > entrada_prog:
-                tabela_ponto.at[idx, 'ENTRADA'] = 'ATRASO'
-                tabela_ponto.at[idx, 'ALERTA'] = 'S'
+def exec_parte2(tabela_ponto: pd.DataFrame, lista_gestores: List[str] = nomes_colaboradores.GESTORES,
+                horarios: Optional[Union[pd.DataFrame, IndiceHorarios]] = None) -> pd.DataFrame:
+    indice = resolver_indice_horarios(horarios)
+    return PipelinePonto(etapas_parte2(lista_gestores, indice)).executar(tabela_ponto.copy())
 
 
-        if saida is None:
-            tabela_ponto.at[idx, 'SAIDA'] = 'SEM MARCAÇÃO'
-            tabela_ponto.at[idx, 'ALERTA'] = 'S'
-        else:
-            if saida < saida_prog:
-                tabela_ponto.at[idx, 'ALERTA'] = 'S'
-                tabela_ponto.at[idx, 'SAIDA'] = 'SAIDA ANTECIPADA'
-             
-        if dia_semana != 'Sabado':
-            if saida_almoco is None:
-                tabela_ponto.at[idx, 'SAIDA INTERVALO'] = 'SEM MARCAÇÃO'
-                tabela_ponto.at[idx, 'ALERTA'] = 'S'        
-            if volta_almoco is None:
-                tabela_ponto.at[idx, 'VOLTA INTERVALO'] = 'SEM MARCAÇÃO'
-                tabela_ponto.at[idx, 'ALERTA'] = 'S'
-        else:
-            if sab2t == 'S':
-                if saida_almoco is None:
-                    tabela_ponto.at[idx, 'SAIDA INTERVALO'] = 'SEM MARCAÇÃO'
-                    tabela_ponto.at[idx, 'ALERTA'] = 'S'        
-                if volta_almoco is None:
-                    tabela_ponto.at[idx, 'VOLTA INTERVALO'] = 'SEM MARCAÇÃO'
-                    tabela_ponto.at[idx, 'ALERTA'] = 'S'
-                    
+def resolver_indice_horarios(horarios: Optional[Union[pd.DataFrame, IndiceHorarios]] = None) -> IndiceHorarios:
+    """
+    Aceita o índice já compilado ou a tabela de horários; sem nenhum dos
+    dois, importa a planilha.
+    """
+    if horarios is None:
+        return import_indice_horarios()
+    if isinstance(horarios, IndiceHorarios):
+        return horarios
+    return compilar_indice_horarios(horarios)
 
-        
-        continue
+
+def verificar_horarios(tabela_ponto: pd.DataFrame, lista_gestores: List[str], indice: IndiceHorarios) -> pd.DataFrame:
+    """
+    Etapa que confere as marcações com o horário programado, aplicada no
+    próprio DataFrame.
+    """
+    nome = _coluna(tabela_ponto, 'COLABORADOR')
+    dia_semana = _coluna(tabela_ponto, 'Dia')
+    ausencia = _coluna(tabela_ponto, 'AUSENCIA')
+    observacao = _coluna(tabela_ponto, 'Observação')
+
+    sem_alerta = nome.isin(lista_gestores) | (observacao != '') | (dia_semana == 'Domingo')
+    tabela_ponto.loc[sem_alerta, 'ALERTA'] = ''
+
+    avaliar = ~sem_alerta & (ausencia != 'SIM')
+    if not avaliar.any():
+        return tabela_ponto
+
+    # Horário programado de todas as linhas de uma vez
+    linhas = tabela_ponto[avaliar]
+    programado = resolver_horarios_programados(linhas, indice)
+    entrada_prog = programado['ENTRADA_PROG'].astype(float)
+    saida_prog = programado['SAIDA_PROG'].astype(float)
+    sab2t = programado['SAB2T']
+
+    # Marcações em minutos desde a meia-noite
+    entrada = converter_coluna_para_minutos(_coluna(linhas, '1a E.'))
+    saida_almoco = converter_coluna_para_minutos(_coluna(linhas, '1a S.'))
+    volta_almoco = converter_coluna_para_minutos(_coluna(linhas, '2a E.'))
+    segunda_saida = converter_coluna_para_minutos(_coluna(linhas, '2a S.'))
+
+    sabado = linhas['Dia'] == 'Sabado'
+    # Sábado de um turno: a saída é a 1a S.
+    saida = segunda_saida.where(~(sabado & (sab2t == 'N')), saida_almoco)
+
+    sem_programado = entrada_prog.isna() | saida_prog.isna()
+    verificar = ~sem_programado
+
+    entrada_vazia = verificar & entrada.isna()
+    atraso = verificar & (entrada > entrada_prog)
+    saida_vazia = verificar & saida.isna()
+    saida_antecipada = verificar & (saida < saida_prog)
+    verifica_intervalo = verificar & (~sabado | (sab2t == 'S'))
+    saida_intervalo_vazia = verifica_intervalo & saida_almoco.isna()
+    volta_intervalo_vazia = verifica_intervalo & volta_almoco.isna()
+
+    alerta = entrada_vazia | atraso | saida_vazia | saida_antecipada | saida_intervalo_vazia | volta_intervalo_vazia
+
+    def atribuir(coluna: str, mascara: pd.Series, valor: str) -> None:
+        tabela_ponto.loc[mascara[mascara].index, coluna] = valor
+
+    atribuir('ENTRADA', entrada_vazia, 'SEM MARCAÇÃO')
+    atribuir('ENTRADA', atraso, 'ATRASO')
+    atribuir('SAIDA', saida_vazia, 'SEM MARCAÇÃO')
+    atribuir('SAIDA', saida_antecipada, 'SAIDA ANTECIPADA')
+    atribuir('SAIDA INTERVALO', saida_intervalo_vazia, 'SEM MARCAÇÃO')
+    atribuir('VOLTA INTERVALO', volta_intervalo_vazia, 'SEM MARCAÇÃO')
+    atribuir('ALERTA', alerta, 'S')
+    atribuir('ALERTA', sem_programado, 'S/ ENTRADA PROGRAMADA')
 
     return tabela_ponto
 
@@ -663,18 +1208,134 @@ def exec_parte2(tabela_ponto: pd.DataFrame, lista_gestores: List[str] = nomes_co
 
 
 
+def compactar_resultado(resultado: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte o resultado de main para o esquema compacto: categorias nas
+    colunas de vocabulário pequeno, Data como data e, para cada marcação,
+    uma coluna '<marcação> MIN' (Int16, minutos desde a meia-noite) ao lado
+    do texto exibido.
+    """
+    colunas = {}
+    for coluna in resultado.columns:
+        valores = resultado[coluna]
+        if coluna in COLUNAS_CATEGORICAS:
+            colunas[coluna] = valores.astype('category')
+        elif coluna == 'Data':
+            colunas[coluna] = pd.to_datetime(valores, format='%d/%m/%Y', errors='coerce')
+        else:
+            colunas[coluna] = valores
+
+    for coluna in COLUNAS_HORARIO:
+        if coluna in resultado.columns:
+            minutos = np.floor(converter_coluna_para_minutos(resultado[coluna], tolerancia=0))
+            colunas[coluna + SUFIXO_MINUTOS] = minutos.astype('Int16')
+
+    return pd.DataFrame(colunas, index=resultado.index)
+
+
 def save(tabela_consolidada: pd.DataFrame, nome_arquivo: str) -> pd.DataFrame:
-    with pd.ExcelWriter(nome_arquivo, engine='openpyxl') as writer:
-        tabela_consolidada.to_excel(writer, sheet_name='Dados_Consolidados', index=False)
+    exportacao.exportar_excel(tabela_consolidada, nome_arquivo, nome_planilha='Dados_Consolidados')
     return tabela_consolidada
 
 
 
-def main(caminhopdf):
-    resultado = exec_parte1(caminhopdf, lista_gestores= nomes_colaboradores.GESTORES)
+def main(caminhopdf, num_workers: int = 1, motor: str = 'tabelas', backend: str = 'pdfplumber',
+         horarios_csv=None, horarios_offline: bool = False, compacto: bool = False,
+         cd=None, usar_cache: bool = False, incremental: bool = False, progresso: Optional[Progresso] = None):
+    """
+    Processa o PDF e retorna o resultado com COLUNAS_SAIDA. Com usar_cache,
+    o resultado fica salvo em disco pela chave (conteúdo do PDF, CD, versão
+    da planilha de horários, versão e configuração do pipeline) e é
+    reaproveitado nas próximas chamadas. Com
+    incremental, só as páginas alteradas desde a última extração são lidas.
+    O PDF pode ser um caminho, bytes, memoryview ou buffer binário. O
+    callback progresso (ver Progresso) acompanha o processamento e pode
+    interrompê-lo levantando ProcessamentoCancelado.
+    """
+    caminhopdf = normalizar_entrada_pdf(caminhopdf)
+    horarios = import_indice_horarios(offline=horarios_offline, caminho_csv=horarios_csv)
+
+    chave = None
+    resultado = None
+    if usar_cache:
+        chave = _chave_cache(caminhopdf, cd, horarios_csv, motor, backend)
+        resultado = cache_resultados.carregar_resultado(chave)
+
+    if resultado is None:
+        resultado = processar_pdf(caminhopdf, horarios, num_workers=num_workers, motor=motor, backend=backend,
+                                  incremental=incremental, progresso=progresso)
+        if chave is not None:
+            cache_resultados.salvar_resultado(chave, resultado)
+
+    if compacto:
+        return compactar_resultado(resultado)
+    return resultado
+
+
+def _chave_cache(caminhopdf, cd, horarios_csv, motor: str, backend: str) -> str:
+    versao = cache_horarios.versao_horarios(UIID_HORARIOS, GID_HORARIOS, caminho_csv=horarios_csv)
+    variante = f'{_impressao_configuracao()}/{motor}/{backend}'
+    return cache_resultados.chave_resultado(caminhopdf, cd, versao, variante=variante)
+
+
+def _impressao_configuracao() -> str:
+    """
+    Hash das versões e das configurações que alteram a saída (gestores,
+    colunas, padrões de mesclagem), para que resultados gravados com outro
+    código ou outra configuração não sejam reaproveitados.
+    """
+    configuracao = (VERSAO_PIPELINE, VERSAO_EXTRACAO, list(nomes_colaboradores.GESTORES), COLUNAS_SAIDA,
+                    PADRAO_MESCLADO.pattern, PADRAO_HORARIO.pattern, TIPOS_SITUACAO)
+    return hashlib.sha256(repr(configuracao).encode('utf-8')).hexdigest()
+
+
+def processar_pdf(caminhopdf, horarios: IndiceHorarios, num_workers: int = 1, motor: str = 'tabelas',
+                  backend: str = 'pdfplumber', incremental: bool = False,
+                  progresso: Optional[Progresso] = None) -> pd.DataFrame:
+    """
+    Extrai o PDF e executa as duas partes do pipeline sobre a tabela consolidada.
+    """
+    tabelas = extrair_tabelas_espelho_ponto(caminhopdf, num_workers=num_workers, motor=motor,
+                                            backend=backend, ignorar_motoristas=True, incremental=incremental,
+                                            progresso=progresso)
+    if not tabelas:
+        raise ValueError("Nenhuma tabela de ponto encontrada no PDF.")
 
-    resultado = exec_parte2(resultado, lista_gestores= nomes_colaboradores.GESTORES)
+    pipeline = PipelinePonto(etapas_parte1(nomes_colaboradores.GESTORES) +
+                             etapas_parte2(nomes_colaboradores.GESTORES, horarios))
 
-    return resultado[['Dia','3a E.', '3a S.', 'Abono','Observação', '1a E.', '1a S.', '2a E.', '2a S.',
-                'Data', 'COLABORADOR', 'AUSENCIA', 'ENTRADA',
-                'SAIDA INTERVALO', 'VOLTA INTERVALO', 'SAIDA', 'ALERTA']]
+    resultado = pipeline.executar(salvar_tabelas_concatenadas(tabelas), progresso)
+    return resultado[COLUNAS_SAIDA]
+
+
+def main_em_fluxo(caminhopdf, motor: str = 'tabelas', backend: str = 'pdfplumber',
+                  horarios_csv=None, horarios_offline: bool = False) -> Iterator[pd.DataFrame]:
+    """
+    Versão em fluxo de main: cada funcionário passa por todas as etapas e é
+    entregue assim que fica pronto, com memória constante no número de páginas.
+    """
+    horarios = import_indice_horarios(offline=horarios_offline, caminho_csv=horarios_csv)
+    pipeline = PipelinePonto(etapas_parte1(nomes_colaboradores.GESTORES) +
+                             etapas_parte2(nomes_colaboradores.GESTORES, horarios))
+
+    for tabela in gerar_tabelas_espelho_ponto(caminhopdf, motor=motor, backend=backend, ignorar_motoristas=True):
+        resultado = pipeline.executar(tabela)
+        if resultado.empty:
+            continue
+
+        yield resultado[COLUNAS_SAIDA]
+
+
+def salvar_em_fluxo(caminhopdf, caminho_csv: str, motor: str = 'tabelas', backend: str = 'pdfplumber',
+                    horarios_csv=None, horarios_offline: bool = False) -> int:
+    """
+    Processa o PDF em fluxo gravando cada funcionário no CSV à medida que
+    fica pronto. Retorna a quantidade de linhas gravadas.
+    """
+    total_linhas = 0
+    with open(caminho_csv, 'w', newline='', encoding='utf-8') as arquivo:
+        for resultado in main_em_fluxo(caminhopdf, motor=motor, backend=backend,
+                                       horarios_csv=horarios_csv, horarios_offline=horarios_offline):
+            resultado.to_csv(arquivo, header=(total_linhas == 0), index=False)
+            total_linhas += len(resultado)
+    return total_linhas
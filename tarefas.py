@@ -0,0 +1,104 @@
+import time
+from typing import Any, Optional, Sequence, Tuple
+
+import pandas as pd
+
+import fila
+import support
+from leitores_pdf import EntradaPdf
+
+
+class TarefaFila:
+    """
+    Acompanha, pelo banco da fila, as tarefas de um envio (uma por PDF),
+    guardando o progresso (etapa, páginas e arquivos concluídos) e o
+    resultado ou o erro. O processamento acontece nos workers da fila; ao
+    fim, os resultados são combinados com a coluna CD.
+    """
+
+    def __init__(self, arquivos: Sequence[Tuple[EntradaPdf, Any]], sessao: Optional[str] = None,
+                 compacto: bool = False, diretorio: Optional[str] = None, **opcoes):
+        self.diretorio = diretorio
+        self.compacto = compacto
+        self.arquivos = list(arquivos)
+        self.ids = [fila.enfileirar(pdf, cd, sessao=sessao, diretorio=diretorio, **opcoes)
+                    for pdf, cd in self.arquivos]
+        self.etapa = 'iniciando'
+        self.concluidos = 0
+        self.total = 0
+        self.paginas = 0
+        self.total_paginas = 0
+        self.arquivos_concluidos = 0
+        self.inicio = time.time()
+        self.fim: Optional[float] = None
+        self.resultado: Optional[pd.DataFrame] = None
+        self.erro: Optional[BaseException] = None
+        self.cancelada = False
+        self.cancelamento_pedido = False
+        self._tarefas = []
+
+    def iniciar(self) -> 'TarefaFila':
+        # As tarefas já estão na fila desde a criação
+        return self
+
+    def cancelar(self) -> None:
+        if not self.cancelamento_pedido:
+            self.cancelamento_pedido = True
+            for id_tarefa in self.ids:
+                fila.cancelar(id_tarefa, self.diretorio)
+
+    @property
+    def em_andamento(self) -> bool:
+        if self.fim is None:
+            self.atualizar()
+        return self.fim is None
+
+    def atualizar(self) -> None:
+        """
+        Lê o estado das tarefas na fila e, quando todas terminam, publica o
+        resultado, o erro ou o cancelamento.
+        """
+        self._tarefas = fila.consultar(self.ids, self.diretorio)
+        ativas = [t for t in self._tarefas if t['estado'] in fila.ESTADOS_ATIVOS]
+        self.paginas = sum(t['paginas'] for t in self._tarefas)
+        self.total_paginas = sum(t['total_paginas'] for t in self._tarefas)
+        self.arquivos_concluidos = len(self._tarefas) - len(ativas)
+        executando = [t for t in ativas if t['estado'] == 'executando']
+        self.etapa = (executando[0]['etapa'] or 'iniciando') if executando else 'iniciando'
+        if ativas:
+            return
+
+        self.fim = time.time()
+        erros = [t['erro'] for t in self._tarefas if t['estado'] == 'erro']
+        if len(self._tarefas) < len(self.ids):
+            self.erro = LookupError("Tarefa removida da fila antes de ser lida.")
+        elif erros:
+            self.erro = RuntimeError(erros[0])
+        elif any(t['estado'] == 'cancelada' for t in self._tarefas):
+            self.cancelada = True
+        else:
+            resultados = [fila.carregar_resultado(t['id'], self.diretorio) for t in self._tarefas]
+            if any(resultado is None for resultado in resultados):
+                self.erro = LookupError("Resultado removido da fila antes de ser lido.")
+                return
+            resultado = pd.concat([resultado.assign(CD=t['cd']) for resultado, t in zip(resultados, self._tarefas)],
+                                  ignore_index=True)
+            self.resultado = support.compactar_resultado(resultado) if self.compacto else resultado
+
+    def paginas_por_segundo(self) -> float:
+        decorrido = (self.fim or time.time()) - self.inicio
+        return self.paginas / decorrido if decorrido > 0 else 0.0
+
+    def fracao_concluida(self) -> float:
+        """
+        Média das frações de cada PDF: as tarefas ainda na fila contam zero,
+        as finalizadas contam inteiras.
+        """
+        if self.fim is not None:
+            return 1.0
+        if not self._tarefas:
+            return 0.0
+        fracoes = [1.0 if t['estado'] not in fila.ESTADOS_ATIVOS
+                   else t['paginas'] / t['total_paginas'] if t['total_paginas'] else 0.0
+                   for t in self._tarefas]
+        return 0.95 * sum(fracoes) / len(fracoes)
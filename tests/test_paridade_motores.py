@@ -0,0 +1,81 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+import support
+
+pytest.importorskip('reportlab')
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+CABECALHO = ['Data', 'Dia', '1a E.', '1a S.', '2a E.', '2a S.', '3a E.', '3a S.', 'Abono', 'Observação']
+
+HORARIOS_CSV = (
+    'COLABORADORES,PERIODO,ENTRADA,SAIDA,PERIODO.1,ENTRADA.1,SAIDA.1,SAB.2T\n'
+    'MARIA SOUZA,SEG A SEX,08:00,17:00,SAB,08:00,12:00,S\n'
+)
+
+
+@pytest.fixture
+def pdf_mesclado(tmp_path) -> str:
+    """
+    Espelho de ponto com células mescladas de 1a E. a 3a S. e o texto
+    centralizado na mesclagem.
+    """
+    estilos = getSampleStyleSheet()
+    linhas = [
+        ['02/05/2025', 'Sexta', '07:55', '11:02', '12:01', '17:04', '', '', '', ''],
+        ['03/05/2025', 'Sabado', '** AUSENTE **', '', '', '', '', '', '', ''],
+        ['05/05/2025', 'Segunda', 'D.S.R', '', '', '', '', '', '', ''],
+        ['06/05/2025', 'Terca', '07:48', '11:00', '12:00', '17:00', '', '', '', 'Atestado'],
+        ['07/05/2025', 'Quarta', 'Registro no Positron', '', '', '', '', '', '', ''],
+    ]
+    estilo = [('GRID', (0, 0), (-1, -1), 0.5, colors.black), ('FONTSIZE', (0, 0), (-1, -1), 7)]
+    for i, linha in enumerate(linhas, start=1):
+        if not linha[2][0].isdigit():
+            estilo += [('SPAN', (2, i), (7, i)), ('ALIGN', (2, i), (7, i), 'CENTER')]
+    tabela = Table([CABECALHO] + linhas)
+    tabela.setStyle(TableStyle(estilo))
+
+    caminho = str(tmp_path / 'mesclado.pdf')
+    SimpleDocTemplate(caminho, pagesize=A4).build([
+        Paragraph("Espelho de Ponto   CPF: 123.456.789-00", estilos['Normal']),
+        Paragraph("Matrícula: 1001 - 1   Nome: MARIA SOUZA", estilos['Normal']),
+        Paragraph("01/05/2025 - 31/05/2025", estilos['Normal']),
+        Paragraph("Função: 11 - AUXILIAR DE DEPOSITO", estilos['Normal']),
+        Spacer(1, 8),
+        tabela,
+    ])
+    return caminho
+
+
+def test_mesclagem_centralizada_igual_ao_extract_tables(pdf_mesclado):
+    assert benchmark.comparar_motores(pdf_mesclado) == []
+
+    df = support.extrair_tabelas_espelho_ponto(pdf_mesclado, motor='coordenadas')[0]
+    ausente = df[df['Data'] == '03/05/2025'].iloc[0]
+    assert ausente['1a E.'] == '** AUSENTE **'
+    assert ausente['3a S.'] == '** AUSENTE **'
+
+
+def test_backends_extraem_as_mesmas_tabelas(pdf_mesclado):
+    # pdfplumber com extract_tables contra pdfium (sempre por coordenadas)
+    assert benchmark.comparar_backends(pdf_mesclado) == []
+
+
+def test_main_igual_nos_dois_backends(pdf_mesclado, tmp_path):
+    horarios_csv = tmp_path / 'horarios.csv'
+    horarios_csv.write_text(HORARIOS_CSV, encoding='utf-8')
+
+    resultados = [support.main(pdf_mesclado, backend=backend, horarios_csv=str(horarios_csv))
+                  for backend in support.BACKENDS_PDF]
+    assert not resultados[0].empty
+    for resultado in resultados[1:]:
+        pd.testing.assert_frame_equal(resultados[0], resultado)